@@ -0,0 +1,412 @@
+"""Benchmark of the world conversion pipeline on synthetic worlds.
+
+Writes a synthetic .world file (with a matching starbound.config and tileset)
+of the requested size, material diversity, liquid density and entity/wire
+counts, runs each conversion stage on it and reports wall time, peak RSS and
+throughput in tiles per second. The map JSON stage is run with each output
+format (pretty, compact, compact through orjson when installed) to compare
+write time and file size. With --check, the synthetic world is also converted
+with the options that change how a world is read (streaming, alone and combined
+with infinite maps, a region of interest and matmod layers), and each map is
+compared with a plain conversion; a delta map against an edited copy of the
+world must hold exactly the edited tiles and removed entities.
+
+    python benchmark.py --width 3000 --height 2000 --materials 200 --json results.json
+"""
+import argparse, contextlib, json, mmap, os, sys, tempfile, time
+
+import numpy as np
+import starbound
+
+from worldToTiled import (LAYER_COMPRESSIONS, MAP_TILE_LAYER_IDS, REGION_SIZE, TILE_DTYPE, WORLD_TILE_DTYPE, StageProfiler,
+                          WorldToTiledConverter, orjson, pack_region_entities, pack_region_tiles, pack_world_metadata,
+                          world_key, write_btree_file)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def peak_rss_mb():
+    # Peak resident set size of this process so far (None where the platform cannot tell)
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def synthetic_config(materials, mods=8, liquids=4):
+    return {"worldToTiled": {
+        "material": {"0": "empty", **{str(i): f"material{i}" for i in range(1, materials + 1)}},
+        "mod": {"0": "empty", **{str(i): f"mod{i}" for i in range(1, mods + 1)}},
+        "liquid": {"0": "empty", **{str(i): f"liquid{i}" for i in range(1, liquids + 1)}},
+        "wire": {"benchswitch": {"o_0": [1, 0]}, "benchlamp": {"i_0": [0, 1]}},
+    }}
+
+def synthetic_tileset(materials, liquids=4):
+    # Only every other material is in the tileset, so the generated tileset path is exercised too
+    properties = []
+    for i in range(1, materials + 1, 2):
+        properties.append({"material": f"material{i}"})
+        properties.append({"material": f"material{i}", "colorVariant": "1"})
+    for i in range(1, liquids + 1):
+        properties.append({"liquid": f"liquid{i}"})
+        properties.append({"liquid": f"liquid{i}", "source": "true"})
+    return {"tilecount": len(properties), "tileproperties": {str(i): p for i, p in enumerate(properties)}}
+
+def synthetic_entities(rng, width, height, entities, wires):
+    # Entities and wired object pairs spread over random positions, grouped by region
+    by_region = {}
+
+    def add(x, y, entity):
+        by_region.setdefault((int(x) // REGION_SIZE, int(y) // REGION_SIZE), []).append(entity)
+
+    for i in range(entities):
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        kind = i % 4
+        if kind == 0:
+            entity = starbound.VersionedJSON("MonsterEntity", 1, {
+                "monsterVariant": {"seed": i, "type": "poptop", "uniqueParameters": {"persistent": True}},
+                "movementState": {"position": [x + 0.5, y + 0.5]}})
+        elif kind == 1:
+            entity = starbound.VersionedJSON("NpcEntity", 1, {
+                "npcVariant": {"seed": i, "species": "human", "typeName": "villager", "overrides": {}},
+                "movementController": {"position": [x + 0.5, y + 0.5]}})
+        elif kind == 2:
+            entity = starbound.VersionedJSON("ObjectEntity", 1, {
+                "name": "benchcrate", "tilePosition": [x, y], "direction": "left", "parameters": {},
+                "inputWireNodes": [], "outputWireNodes": []})
+        else:
+            entity = starbound.VersionedJSON("VehicleEntity", 1, {
+                "name": "hoverbike", "dynamicConfig": {}, "state": {"movement": {"position": [x, y]}}})
+        add(x, y, entity)
+
+    for i in range(wires):
+        x, y = int(rng.integers(0, max(width - 8, 1))), int(rng.integers(0, height))
+        lamp_x = x + 4
+        add(x, y, starbound.VersionedJSON("ObjectEntity", 1, {
+            "name": "benchswitch", "tilePosition": [x, y], "direction": "left", "parameters": {},
+            "inputWireNodes": [], "outputWireNodes": [{"connections": [[[lamp_x, y], 0]]}]}))
+        add(lamp_x, y, starbound.VersionedJSON("ObjectEntity", 1, {
+            "name": "benchlamp", "tilePosition": [lamp_x, y], "direction": "right", "parameters": {},
+            "inputWireNodes": [{"connections": [[[x, y], 0]]}], "outputWireNodes": []}))
+    return by_region
+
+def write_synthetic_world(path, width, height, materials, liquid_density, entities, wires, seed=0, mods=8, liquids=4,
+                          edit=None):
+    # edit(rx, ry, tiles, region_entities) may change each region's tiles and entity list before it is written
+    rng = np.random.default_rng(seed)
+    items = {world_key(0, 0, 0): pack_world_metadata(width, height, {"benchmark": True})}
+    entities_by_region = synthetic_entities(rng, width, height, entities, wires)
+
+    region_cols, region_rows = -(-width // REGION_SIZE), -(-height // REGION_SIZE)
+    for ry in range(region_rows):
+        for rx in range(region_cols):
+            tiles = np.zeros((REGION_SIZE, REGION_SIZE), dtype=TILE_DTYPE)
+            shape = tiles.shape
+            # About a quarter of the foreground is open, and liquid only sits in open cells
+            foreground = rng.integers(1, materials + 1, size=shape) * (rng.random(shape) >= 0.25)
+            tiles["foreground_material"] = foreground
+            tiles["foreground_variant"] = rng.integers(0, 3, size=shape)
+            tiles["foreground_mod"] = rng.integers(1, mods + 1, size=shape) * (rng.random(shape) < 0.1)
+            tiles["background_material"] = rng.integers(0, materials + 1, size=shape)
+            tiles["background_variant"] = rng.integers(0, 2, size=shape)
+            liquid = (foreground == 0) & (rng.random(shape) < liquid_density)
+            tiles["liquid"] = rng.integers(1, liquids + 1, size=shape) * liquid
+            tiles["liquid_level"] = liquid
+            tiles["liquid_infinite"] = liquid & (rng.random(shape) < 0.2)
+            region_entities = entities_by_region.get((rx, ry), [])
+            if edit is not None:
+                edit(rx, ry, tiles, region_entities)
+            items[world_key(1, rx, ry)] = pack_region_tiles(tiles)
+
+            if region_entities:
+                items[world_key(2, rx, ry)] = pack_region_entities(region_entities)
+
+    write_btree_file(path, "World4", items)
+
+def make_fixtures(folder, args):
+    config_path = os.path.join(folder, "starbound.config")
+    with open(config_path, "w", encoding="utf-8") as f:
+        json.dump(synthetic_config(args.materials), f)
+    tileset_path = os.path.join(folder, "benchtiles.json")
+    with open(tileset_path, "w", encoding="utf-8") as f:
+        json.dump(synthetic_tileset(args.materials), f)
+    world_path = os.path.join(folder, "synthetic.world")
+    write_synthetic_world(world_path, args.width, args.height, args.materials, args.liquid_density,
+                          args.entities, args.wires, args.seed)
+    return config_path, tileset_path, world_path
+
+class StageTimes:
+    """Collects (stage, seconds, peak RSS) rows; each stage is timed with `with times.stage(name) as row:`.
+
+    Extra figures (such as an output file size) can be added to the yielded row.
+    """
+
+    def __init__(self, tiles):
+        self.tiles = tiles
+        self.rows = []
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        row = {"stage": name}
+        start = time.perf_counter()
+        # Converter progress output is not part of the measurement
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            yield row
+        seconds = time.perf_counter() - start
+        row.update({
+            "seconds": seconds,
+            "peak_rss_mb": peak_rss_mb(),
+            "tiles_per_second": self.tiles / seconds if seconds > 0 else None,
+        })
+        self.rows.append(row)
+
+    def print_table(self):
+        print(f"{'stage':<42}{'seconds':>10}{'peak RSS MB':>14}{'tiles/s':>16}{'write s':>10}{'file MB':>10}")
+        for row in self.rows:
+            rss = f"{row['peak_rss_mb']:.0f}" if row["peak_rss_mb"] is not None else "n/a"
+            rate = f"{row['tiles_per_second']:,.0f}" if row["tiles_per_second"] else "n/a"
+            write = f"{row['write_seconds']:.3f}" if "write_seconds" in row else ""
+            size = f"{row['file_mb']:.2f}" if "file_mb" in row else ""
+            print(f"{row['stage']:<42}{row['seconds']:>10.3f}{rss:>14}{rate:>16}{write:>10}{size:>10}")
+
+def run_stages(folder, config_path, tileset_path, world_path, full, options):
+    # options: WorldToTiledConverter keyword arguments (layer compression)
+    converter = WorldToTiledConverter(**options)
+    config = converter.load_config(config_path)
+    all_tilesets = converter.load_tilesets([tileset_path])
+    firstgids = converter.tileset_firstgids(all_tilesets)
+    converter.key_cache.use_tilesets(all_tilesets)
+    missing_tile_map = {}
+
+    with open(world_path, "rb") as fh:
+        mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        world = starbound.World(mm)
+        world.read_metadata()
+        width, height = world.width, world.height
+        times = StageTimes(width * height)
+
+        with times.stage("region decode"):
+            chunk_list = list(world.get_all_regions_with_tiles())
+            tile_map = np.zeros((height, width), dtype=WORLD_TILE_DTYPE)
+            entity_lists = converter.decode_regions(world, chunk_list, tile_map, config["wire"])
+
+    with times.stage("ID -> name"):
+        for field, table, label in (("foreground_material", "material", "material"),
+                                    ("background_material", "material", "material"),
+                                    ("foreground_mod", "mod", "material mod"),
+                                    ("background_mod", "mod", "material mod"),
+                                    ("liquid", "liquid", "liquid")):
+            present, _ = converter.compact_ids(tile_map[field])
+            converter.ids_to_names(present, config[table], label)
+
+    with times.stage("name -> tileset GID"):
+        layers = converter.tile_map_to_gids(tile_map, config, all_tilesets, firstgids, missing_tile_map)
+    del tile_map
+
+    with times.stage("encode_map"):
+        front, back, liquid = (converter.encode_map(np.flipud(layers[name])) for name in ("front", "back", "liquid"))
+    del layers
+
+    generated_path = os.path.join(folder, "generated_tiles.json")
+    with open(generated_path, "w", encoding="utf-8") as f:
+        json.dump(converter.generate_missing_tileset_from_map(missing_tile_map), f)
+    tilesets = converter.generate_tilesets(
+        [(tileset_path, "benchtiles"), (generated_path, "generated_tiles")], relative_to=folder,
+        tilecounts={generated_path: len(missing_tile_map)})
+
+    map_folder = os.path.join(folder, "maps")
+    os.makedirs(map_folder, exist_ok=True)
+    json_variants = [("pretty", "json"), ("compact", "json")] + ([("compact", "orjson")] if orjson else [])
+    for json_format, json_backend in json_variants:
+        converter.json_format, converter.json_backend = json_format, json_backend
+        converter.profiler = StageProfiler()
+        with times.stage(f"create_tiled_map_json ({json_format}, {json_backend})") as row:
+            map_path = converter.create_tiled_map_json(
+                world_path, map_folder, front, back, liquid, width, height, tilesets,
+                entity_lists["monsters"], entity_lists["npcs"], entity_lists["objects"], entity_lists["vehicles"],
+                entity_lists["object_output_nodes"], entity_lists["object_input_nodes"])
+        # The json.dump / orjson part of the stage, without building the map structure
+        row["write_seconds"] = converter.profiler.stages["write map JSON"]["seconds"]
+        row["file_mb"] = os.path.getsize(map_path) / (1024 * 1024)
+
+    if full:
+        with times.stage("convert_world (total)"):
+            WorldToTiledConverter(**options).convert_world(config, world_path, [tileset_path], folder, map_folder, all_tilesets)
+
+    return times
+
+def map_contents(converter, map_path, tileset_paths):
+    # A written map's tile layers with every GID replaced by its tileset key, so maps whose generated tile IDs
+    # differ still compare equal, and its object layers without object IDs, in a fixed order
+    with open(map_path, encoding="utf-8") as f:
+        map_data = json.load(f)
+    all_tilesets, firstgids = converter.map_tilesets(map_data, map_path, tileset_paths)
+    gid_keys = {0: "empty"}
+    for tileset in all_tilesets:
+        for key, local_id in tileset["material_map"].items():
+            gid_keys[firstgids[tileset["name"]] + int(local_id)] = repr(key)
+
+    tiles = {}
+    for name, gids in converter.read_map_layers(map_data).items():
+        values, inverse = np.unique(gids, return_inverse=True)
+        keys = np.array([gid_keys.get(value, "unknown") for value in values.tolist()])
+        tiles[name] = keys[inverse].reshape(gids.shape)
+    objects = {
+        layer["name"]: sorted(json.dumps({k: v for k, v in obj.items() if k != "id"}, sort_keys=True)
+                              for obj in layer["objects"])
+        for layer in map_data["layers"] if layer["type"] == "objectgroup"
+    }
+    return tiles, objects
+
+def convert_quietly(converter, config, world_path, tileset_path, output):
+    # convert_world into output/tilesets and output/maps, without the converter's progress output
+    tileset_folder, map_folder = os.path.join(output, "tilesets"), os.path.join(output, "maps")
+    os.makedirs(tileset_folder, exist_ok=True)
+    os.makedirs(map_folder, exist_ok=True)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        return converter.convert_world(config, world_path, [tileset_path], tileset_folder, map_folder)
+
+def check_conversions(folder, config_path, tileset_path, world_path, width, height, options):
+    # Converts the world with each checked option set and compares the map with the one of its reference options;
+    # returns the labels of the checks whose maps differ
+    roi = (width // 4, height // 4, width // 2 + 7, height // 2 + 5)
+    checks = [
+        ("stream", {"stream_band_rows": 2}, {}),
+        ("stream + infinite", {"stream_band_rows": 2, "infinite": True}, {}),
+        ("stream + roi", {"stream_band_rows": 2, "roi": roi}, {"roi": roi}),
+        ("stream + infinite + roi", {"stream_band_rows": 2, "infinite": True, "roi": roi}, {"roi": roi}),
+        ("stream + mod layers", {"stream_band_rows": 2, "mod_layers": True}, {"mod_layers": True}),
+    ]
+    converter = WorldToTiledConverter(**options)
+    config = converter.load_config(config_path)
+    contents = {}
+
+    def convert(extra):
+        # Each option set is converted once, into its own folder
+        key = json.dumps(extra, sort_keys=True)
+        if key not in contents:
+            result = convert_quietly(WorldToTiledConverter(**options, **extra), config, world_path, tileset_path,
+                                     os.path.join(folder, "check", str(len(contents))))
+            contents[key] = map_contents(converter, result["map_path"], [tileset_path, result["generated_tileset_path"]])
+        return contents[key]
+
+    failures = []
+    for label, extra, reference in checks:
+        tiles, objects = convert(extra)
+        reference_tiles, reference_objects = convert(reference)
+        same = (tiles.keys() == reference_tiles.keys() and objects == reference_objects
+                and all(np.array_equal(tiles[name], reference_tiles[name]) for name in tiles))
+        print(f"check {label:<36}{'ok' if same else 'DIFFERENT'}")
+        if not same:
+            failures.append(label)
+    return failures
+
+def check_delta(folder, config_path, tileset_path, world_path, args, options):
+    # Writes a copy of the world with a 4x4 block of foreground tiles changed and one monster, npc or vehicle removed
+    # in every fifth region, and checks the delta map of each option set against those edits; returns the labels of
+    # the checks whose maps differ. Regions on the right and top edges are not edited: they may reach past the
+    # world, and entity positions there can round onto the edge, which cropped maps leave out.
+    edited = {"tiles": 0, "entities": 0}
+
+    def edit(rx, ry, tiles, region_entities):
+        if (rx + ry) % 5 or (rx + 1) * REGION_SIZE >= args.width or (ry + 1) * REGION_SIZE >= args.height:
+            return
+        block = tiles["foreground_material"][8:12, 8:12]
+        block[...] = block % args.materials + 1
+        edited["tiles"] += block.size
+        removable = [entity for entity in region_entities
+                     if entity.name in ("MonsterEntity", "NpcEntity", "VehicleEntity")]
+        if removable:
+            region_entities.remove(removable[0])
+            edited["entities"] += 1
+
+    check_folder = os.path.join(folder, "check")
+    os.makedirs(check_folder, exist_ok=True)
+    edited_path = os.path.join(check_folder, "edited.world")
+    write_synthetic_world(edited_path, args.width, args.height, args.materials, args.liquid_density,
+                          args.entities, args.wires, args.seed, edit=edit)
+
+    converter = WorldToTiledConverter(**options)
+    config = converter.load_config(config_path)
+    failures = []
+    for label, extra in (("delta", {}), ("delta + infinite", {"infinite": True}), ("delta + auto bbox", {"auto_bbox": True})):
+        result = convert_quietly(WorldToTiledConverter(delta_from=world_path, **options, **extra), config, edited_path,
+                                 tileset_path, os.path.join(check_folder, label.replace(" + ", "_")))
+        with open(result["map_path"], encoding="utf-8") as f:
+            map_data = json.load(f)
+
+        # Tiles by layer (the live layers by their MAP_TILE_LAYER_IDS name) and object counts by layer name
+        tiles, objects = {}, {}
+        for layer in map_data["layers"]:
+            if layer["type"] == "objectgroup":
+                objects[layer["name"]] = len(layer["objects"])
+                continue
+            name = MAP_TILE_LAYER_IDS.get(layer["id"], layer["name"])
+            parts = layer["chunks"] if "chunks" in layer else [layer]
+            tiles[name] = sum(
+                int(np.count_nonzero(converter.layer_gids(part["data"], layer.get("compression", ""), part["width"], part["height"])))
+                for part in parts)
+        removed = sum(count for name, count in objects.items() if name.startswith("removed "))
+        added = sum(count for name, count in objects.items() if not name.startswith("removed "))
+        same = (tiles["front"] == edited["tiles"] and tiles["back"] == tiles["liquid"] == 0
+                and 0 < tiles["front (before)"] <= edited["tiles"] and tiles["back (before)"] == tiles["liquid (before)"] == 0
+                and removed == edited["entities"] and added == 0)
+        print(f"check {label:<36}{'ok' if same else 'DIFFERENT'}")
+        if not same:
+            failures.append(label)
+    return failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the world conversion pipeline on a synthetic world.")
+    parser.add_argument("--width", type=int, default=1000, help="world width in tiles (default: 1000)")
+    parser.add_argument("--height", type=int, default=1000, help="world height in tiles (default: 1000)")
+    parser.add_argument("--materials", type=int, default=50, help="number of distinct materials (default: 50)")
+    parser.add_argument("--liquid-density", type=float, default=0.3,
+                        help="fraction of open cells holding liquid (default: 0.3)")
+    parser.add_argument("--entities", type=int, default=1000,
+                        help="monsters, npcs, objects and vehicles in total (default: 1000)")
+    parser.add_argument("--wires", type=int, default=200, help="wired switch/lamp object pairs (default: 200)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the synthetic world")
+    parser.add_argument("--full", action="store_true", help="also time a complete convert_world run")
+    parser.add_argument("--keep", metavar="DIR", help="write the synthetic files and outputs to DIR and keep them")
+    parser.add_argument("--compression", choices=LAYER_COMPRESSIONS, default="zlib", help="tile layer format (default: zlib)")
+    parser.add_argument("--compression-level", type=int, metavar="LEVEL", help="layer compression level")
+    parser.add_argument("--json", metavar="PATH", help="also write the results to this .json file")
+    parser.add_argument("--check", action="store_true",
+                        help="also check that streaming conversions, alone and with infinite maps, a region of "
+                             "interest or matmod layers, write the same maps as plain ones, and that delta maps hold "
+                             "exactly the changes of an edited copy of the world (exit code 1 if not)")
+    args = parser.parse_args(argv)
+
+    with contextlib.ExitStack() as stack:
+        if args.keep:
+            folder = args.keep
+            os.makedirs(folder, exist_ok=True)
+        else:
+            folder = stack.enter_context(tempfile.TemporaryDirectory())
+
+        start = time.perf_counter()
+        config_path, tileset_path, world_path = make_fixtures(folder, args)
+        print(f"Synthetic {args.width}x{args.height} world written in {time.perf_counter() - start:.2f}s "
+              f"({os.path.getsize(world_path) / (1024 * 1024):.1f} MB)")
+
+        options = {"compression": args.compression, "compression_level": args.compression_level}
+        times = run_stages(folder, config_path, tileset_path, world_path, args.full, options)
+        failures = []
+        if args.check:
+            failures = check_conversions(folder, config_path, tileset_path, world_path, args.width, args.height, options)
+            failures += check_delta(folder, config_path, tileset_path, world_path, args, options)
+
+    times.print_table()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"parameters": vars(args), "stages": times.rows, "failedChecks": failures}, f, indent=4)
+    if failures:
+        print("Failed checks: " + ", ".join(failures))
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,82 +1,778 @@
-import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
-
+import argparse
 import base64
-import zlib, os
+import zlib, os, sys
 import mmap, starbound
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from multiprocessing import shared_memory
 import numpy as np
 import json
+import hashlib, io, pickle, struct
+from collections import Counter
+import contextlib, cProfile, pstats, time, tracemalloc
+import queue, threading
+from starbound import btreedb5, sbon
+
+# Optional faster JSON serializer for compact output (see WorldToTiledConverter.write_json)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Optional, only needed for zstd layer compression
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# tkinter is only imported when the window is opened (see load_tkinter), so headless runs never need Tk
+tk = filedialog = messagebox = ttk = None
+
+def load_tkinter():
+    global tk, filedialog, messagebox, ttk
+    import tkinter as tk
+    from tkinter import filedialog, messagebox, ttk
+
+# Serialized layout of a single tile inside a world region (see starbound.World.read_tile)
+TILE_DTYPE = np.dtype([
+    ("foreground_material", ">u2"),
+    ("foreground_hue_shift", "u1"),
+    ("foreground_variant", "u1"),
+    ("foreground_mod", ">u2"),
+    ("foreground_mod_hue_shift", "u1"),
+    ("background_material", ">u2"),
+    ("background_hue_shift", "u1"),
+    ("background_variant", "u1"),
+    ("background_mod", ">u2"),
+    ("background_mod_hue_shift", "u1"),
+    ("liquid", "u1"),
+    ("liquid_level", ">f4"),
+    ("liquid_pressure", ">f4"),
+    ("liquid_infinite", "u1"),
+    ("collision", "u1"),
+    ("dungeon_id", ">u2"),
+    ("biome", "u1"),
+    ("biome_2", "u1"),
+    ("indestructible", "u1"),
+    ("padding", "V1"),
+])
+
+# Fields kept in memory for the whole world (native byte order)
+WORLD_TILE_DTYPE = np.dtype([
+    ("foreground_material", np.uint16),
+    ("foreground_variant", np.uint8),
+    ("foreground_mod", np.uint16),
+    ("background_material", np.uint16),
+    ("background_variant", np.uint8),
+    ("background_mod", np.uint16),
+    ("liquid", np.uint8),
+    ("liquid_infinite", np.uint8),
+])
+
+REGION_SIZE = 32
+REGION_HEADER_SIZE = 3  # Unknown bytes in front of the tile data
+MAX_COLOR_VARIANT = 8
+EMPTY_MATERIAL_ID = 65535  # Starbound's IDs for "no material" / "no mod", used when the config has no "empty" entry
+NO_MOD_ID = 65535
+WORLD_EXTENSIONS = (".world", ".shipworld")
+REGION_CACHE_VERSION = 2  # Bump when the cached region entry layout changes
+INDEX_CACHE_VERSION = 2  # Bump when the layout of compiled config/tileset indexes changes
+LAYER_STORE_VERSION = 1  # Bump when the files of a layer store change
+LAYER_STORE_EXTENSION = ".layers"
+
+# Stages reported to progress_callback, in order, with their rough share of a large world's conversion time
+CONVERSION_STAGES = (
+    ("Loading tilesets", 0.01),
+    ("Reading world file", 0.01),
+    ("Decoding regions", 0.30),
+    ("Resolving tile GIDs", 0.10),
+    ("Encoding map data", 0.35),
+    ("Generating missing tileset", 0.01),
+    ("Creating Tiled map JSON", 0.22),
+)
+
+# Tiled tile layer formats: base64 with zlib/gzip/zstd compression, uncompressed base64 ("none"), or CSV
+LAYER_COMPRESSIONS = ("zlib", "gzip", "zstd", "none", "csv")
+ZSTD_DEFAULT_LEVEL = 3
+
+# Tile layers of a map; with mod_layers the matmods get their own layers instead of being part of the material tiles
+TILE_LAYERS = ("front", "back", "liquid")
+MOD_TILE_LAYERS = ("front_mods", "back_mods")
+
+# Tile layers of the maps written by create_tiled_map_json by layer ID (the liquid layer is also named "front")
+MAP_TILE_LAYER_IDS = {1: "back", 2: "liquid", 3: "front", 4: "front_mods", 11: "back_mods"}
+# Bits of a Tiled GID that are not flip flags
+TILED_GID_MASK = 0x0FFFFFFF
+
+# File name of the generated tileset shared by all worlds converted into one tileset folder
+SHARED_TILESET_NAME = "generated_tiles.json"
+
+# Entity kinds a map can include, with the world entity each one is read from (wiring comes from the objects' wire nodes)
+ENTITY_TYPES = ("monsters", "npcs", "objects", "vehicles", "wiring")
+ENTITY_TYPE_NAMES = {
+    "monsters": "MonsterEntity",
+    "npcs": "NpcEntity",
+    "objects": "ObjectEntity",
+    "vehicles": "VehicleEntity",
+    "wiring": "ObjectEntity",
+}
+
+class PassthroughCompressor:
+    """compressobj-like stand-in for layers that are written uncompressed."""
+
+    def compress(self, data):
+        return bytes(data)
+
+    def flush(self):
+        return b""
+
+class ConversionCancelled(Exception):
+    """Raised inside a conversion once its cancel_event is set."""
+
+class TileKeyCache:
+    """Memoized tileset lookups keyed on normalized tile keys.
+
+    Keys are (material, colorVariant, mod), (liquid, source) or (mod,) tuples,
+    so the foreground, background, liquid and matmod passes share one table. Entries stay valid
+    as long as the tilesets keep their names and compiled indexes, which lets a batch of worlds
+    and later runs of the same converter reuse them too.
+    """
+
+    def __init__(self):
+        self.tilesets = None
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def use_tilesets(self, all_tilesets):
+        # load_tileset builds new tileset dicts on every call, but shares the compiled material_map of a file
+        # until it changes; other tilesets or changed files may map the same key elsewhere, so start over
+        tilesets = [(tileset["name"], tileset["material_map"]) for tileset in all_tilesets]
+        if self.tilesets is not None and len(self.tilesets) == len(tilesets) \
+           and all(a[0] == b[0] and a[1] is b[1] for a, b in zip(self.tilesets, tilesets)):
+            return
+        self.tilesets = tilesets
+        self.entries.clear()
+
+    def lookup(self, key, resolve):
+        if key in self.entries:
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        result = self.entries[key] = resolve()
+        return result
 
-class StarboundToTiledUI:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("Starbound → Tiled Converter")
-        self.root.geometry("600x400")
-
-        # Path variables
-        self.config_path = tk.StringVar()
-        self.world_path = tk.StringVar()
-        self.tileset_paths = []
-        self.tileset_save_path = tk.StringVar()
-        self.map_save_path = tk.StringVar()
-
-        self.create_widgets()
-
-    def create_widgets(self):
-        row = 0
-
-        # starbound.config
-        tk.Label(self.root, text="starbound.config path:").grid(row=row, column=0, sticky="w")
-        tk.Entry(self.root, textvariable=self.config_path, width=50).grid(row=row, column=1)
-        tk.Button(self.root, text="Browse", command=self.select_config).grid(row=row, column=2)
-        row += 1
-
-        # .world file
-        tk.Label(self.root, text=".world file path:").grid(row=row, column=0, sticky="w")
-        tk.Entry(self.root, textvariable=self.world_path, width=50).grid(row=row, column=1)
-        tk.Button(self.root, text="Browse", command=self.select_world).grid(row=row, column=2)
-        row += 1
-
-        # Multiple tilesets to load
-        tk.Label(self.root, text="Tileset files to load:").grid(row=row, column=0, sticky="w")
-        tk.Button(self.root, text="Add Tilesets", command=self.add_tilesets).grid(row=row, column=1, sticky="w")
-        row += 1
-
-        # Tileset list table
-        self.tileset_table = ttk.Treeview(self.root, columns=("path",), show="headings", height=5)
-        self.tileset_table.heading("path", text="Tileset Path")
-        self.tileset_table.grid(row=row, column=0, columnspan=3, sticky="nsew")
-        row += 1
+    def report(self):
+        total = self.hits + self.misses
+        hit_rate = 100.0 * self.hits / total if total else 0.0
+        return (f"Tile key cache: {self.hits} hits, {self.misses} misses "
+                f"({hit_rate:.1f}% hit rate, {len(self.entries)} entries)")
+
+class RegionCache:
+    """On-disk cache of decoded regions for one world file.
+
+    Entries hold a region's decoded tile block and extracted entities. They are
+    keyed by a hash of the region's compressed tile and entity blobs, so only
+    regions whose bytes changed since the last run are decoded again. The
+    fingerprint covers everything else the entries depend on (world height, wire
+    table); a different fingerprint discards the whole file.
+    """
+
+    def __init__(self, path, fingerprint):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.entries = {}
+        self.used = {}
+        self.hits = 0
+        self.misses = 0
+
+        if os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    stored = pickle.load(f)
+                if stored.get("fingerprint") == fingerprint:
+                    self.entries = stored["regions"]
+            except Exception as e:
+                print(f"Ignoring unreadable region cache {path}: {e}")
+
+    def region_key(self, tile_blob, entity_blob):
+        digest = hashlib.sha1(tile_blob)
+        digest.update(b"\0" if entity_blob is None else b"\1" + entity_blob)
+        return digest.digest()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.used[key] = entry
+        return entry
+
+    def put(self, key, entry):
+        self.used[key] = entry
+
+    def save(self):
+        # Only regions seen in this run are kept; write to a temp file so a crash never leaves a torn cache
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump({"fingerprint": self.fingerprint, "regions": self.used}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.path)
+
+    def report(self):
+        return f"Region cache: {self.hits} regions reused, {self.misses} decoded"
+
+class StageProfiler:
+    """Timings of the stages of one conversion.
+
+    Each `with profiler.stage(name, cells):` block adds its elapsed time and the
+    number of cells it processed to that stage's totals, so a stage entered
+    repeatedly (once per band in streaming mode) is summed. With
+    trace_allocations, tracemalloc also records the bytes each stage allocated
+    and its peak; with python_profile the whole run is captured by cProfile.
+    A stage may run inside another one; its time is then also part of the outer
+    stage's time.
+    """
+
+    def __init__(self, python_profile=False, trace_allocations=False):
+        self.stages = {}
+        self.python_profile = cProfile.Profile() if python_profile else None
+        self.trace_allocations = trace_allocations
+        self.started_tracing = False
+        self.total_seconds = 0.0
+        # [traced bytes at entry, highest traced peak seen] of each open stage, innermost last
+        self.open_stages = []
+
+    @contextlib.contextmanager
+    def capture(self):
+        # Wraps the whole conversion; stops cProfile/tracemalloc even when the conversion fails
+        if self.trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        if self.python_profile:
+            self.python_profile.enable()
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.total_seconds = time.perf_counter() - start
+            if self.python_profile:
+                self.python_profile.disable()
+            if self.started_tracing:
+                tracemalloc.stop()
+                self.started_tracing = False
+
+    @contextlib.contextmanager
+    def stage(self, name, cells=0):
+        tracing = self.trace_allocations and tracemalloc.is_tracing()
+        if tracing:
+            allocated, peak = tracemalloc.get_traced_memory()
+            # reset_peak would lose the enclosing stage's peak, so remember it first
+            if self.open_stages:
+                self.open_stages[-1][1] = max(self.open_stages[-1][1], peak)
+            tracemalloc.reset_peak()
+            self.open_stages.append([allocated, allocated])
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.stages.setdefault(name, {"seconds": 0.0, "cells": 0, "calls": 0})
+            entry["seconds"] += time.perf_counter() - start
+            entry["cells"] += cells
+            entry["calls"] += 1
+            if tracing:
+                allocated, peak = tracemalloc.get_traced_memory()
+                allocated_before, stage_peak = self.open_stages.pop()
+                stage_peak = max(stage_peak, peak)
+                if self.open_stages:
+                    self.open_stages[-1][1] = max(self.open_stages[-1][1], stage_peak)
+                entry["allocatedBytes"] = entry.get("allocatedBytes", 0) + allocated - allocated_before
+                entry["peakBytes"] = max(entry.get("peakBytes", 0), stage_peak - allocated_before)
+
+    def summary(self):
+        stages = ", ".join(f"{name} {entry['seconds']:.2f}s" for name, entry in self.stages.items())
+        return f"Stage timings: {stages} (total {self.total_seconds:.2f}s)"
+
+    def python_profile_entries(self, limit=30):
+        # The functions with the highest cumulative time, as plain JSON values
+        stats = pstats.Stats(self.python_profile).stats
+        entries = sorted(stats.items(), key=lambda item: -item[1][3])[:limit]
+        return [{
+            "function": f"{function} ({os.path.basename(filename)}:{line})",
+            "calls": calls,
+            "totalSeconds": round(total, 6),
+            "cumulativeSeconds": round(cumulative, 6),
+        } for (filename, line, function), (primitive_calls, calls, total, cumulative, callers) in entries]
+
+    def report(self):
+        stages = []
+        for name, entry in self.stages.items():
+            seconds = entry["seconds"]
+            stage = {"stage": name, "seconds": round(seconds, 6), "calls": entry["calls"], "cells": entry["cells"]}
+            if entry["cells"]:
+                stage["cellsPerSecond"] = round(entry["cells"] / seconds) if seconds > 0 else None
+            for key in ("allocatedBytes", "peakBytes"):
+                if key in entry:
+                    stage[key] = entry[key]
+            stages.append(stage)
+
+        report = {"totalSeconds": round(self.total_seconds, 6), "stages": stages}
+        if self.python_profile:
+            report["pythonProfile"] = self.python_profile_entries()
+        return report
+
+@contextlib.contextmanager
+def file_lock(path, timeout=60.0, stale_seconds=300.0):
+    # Exclusive lock on path between processes (and threads): <path>.lock is created with O_EXCL and holds a token
+    # unique to this acquisition while the block runs. A lock left behind by a crashed process is taken over once
+    # it is stale_seconds old.
+    lock_path = path + ".lock"
+    token = f"{os.getpid()} {os.urandom(8).hex()}".encode("ascii")
+    aside_path = f"{lock_path}.{os.getpid()}.{os.urandom(8).hex()}"
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > stale_seconds:
+                    with open(lock_path, "rb") as f:
+                        stale_token = f.read()
+                    remove_lock_file(lock_path, stale_token, aside_path)
+                    continue
+            except OSError:
+                # Released (or taken over) in the meantime
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for {lock_path}")
+            time.sleep(0.05)
+    try:
+        os.write(fd, token)
+        os.close(fd)
+        yield
+    finally:
+        # A lock taken over as stale belongs to another process now and is left alone
+        remove_lock_file(lock_path, token, aside_path)
+
+def remove_lock_file(lock_path, token, aside_path):
+    # Removes lock_path if it still holds token. The file is renamed to aside_path first, which only one process
+    # can do, and put back if it turns out to be another acquisition's lock; returns whether it was removed.
+    try:
+        os.rename(lock_path, aside_path)
+    except OSError:
+        # Already removed or taken over
+        return False
+    with open(aside_path, "rb") as f:
+        held = f.read()
+    if held != token:
+        try:
+            # Unlike rename, link never replaces a lock created in the meantime
+            os.link(aside_path, lock_path)
+        except OSError:
+            pass
+    os.remove(aside_path)
+    return held == token
+
+def default_index_cache_dir():
+    # Per-user cache folder for compiled config and tileset indexes
+    if os.name == "nt" and os.environ.get("LOCALAPPDATA"):
+        return os.path.join(os.environ["LOCALAPPDATA"], "worldToTiled", "cache")
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "worldToTiled")
+
+class FileIndexCache:
+    """On-disk cache of data compiled from source files (the parsed config and tilesets).
+
+    Each source file gets one pickled entry in cache_dir. An entry is used as
+    long as the source's size and mtime are unchanged; when they differ the
+    source's SHA-1 decides, so a file that was only touched or rewritten with
+    the same content is not compiled again.
+    """
+
+    def __init__(self, cache_dir, kind):
+        self.cache_dir = cache_dir
+        self.kind = kind
+        self.hits = 0
+        self.misses = 0
+
+    def entry_path(self, source_path):
+        source_path = os.path.abspath(source_path)
+        name = hashlib.sha1(source_path.encode("utf-8")).hexdigest()[:16] + "_" + os.path.basename(source_path)
+        return os.path.join(self.cache_dir, f"{name}.{self.kind}.index")
+
+    def read_entry(self, entry_path):
+        try:
+            with open(entry_path, "rb") as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Ignoring unreadable index {entry_path}: {e}")
+            return None
+        return entry if entry.get("version") == INDEX_CACHE_VERSION else None
+
+    def write_entry(self, entry_path, entry):
+        # Write to a temp file so a crash (or a concurrent batch worker) never leaves a torn index
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = f"{entry_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, entry_path)
+
+    def get(self, source_path, compile):
+        # compile(raw bytes of the source file) builds the data when there is no valid entry
+        entry_path = self.entry_path(source_path)
+        stat = os.stat(source_path)
+        file_key = (stat.st_size, stat.st_mtime_ns)
+
+        entry = self.read_entry(entry_path)
+        if entry is not None and entry["file"] == file_key:
+            self.hits += 1
+            return entry["data"]
+
+        with open(source_path, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha1(raw).hexdigest()
+        if entry is not None and entry["sha1"] == digest:
+            self.hits += 1
+            data = entry["data"]
+        else:
+            self.misses += 1
+            data = compile(raw)
+        self.write_entry(entry_path, {"version": INDEX_CACHE_VERSION, "file": file_key, "sha1": digest, "data": data})
+        return data
+
+class IdNameTable:
+    """One ID -> name section of the worldToTiled config as sorted NumPy arrays."""
+
+    def __init__(self, ids, names):
+        self.ids = ids
+        self.names = names
+
+    @staticmethod
+    def compile(table):
+        # (ids, names) arrays of a config section; keys are IDs as strings, anything else can never match a tile ID
+        items = sorted((int(key), name) for key, name in table.items() if key.isdigit())
+        ids = np.array([id_ for id_, name in items], dtype=np.int64)
+        names = np.array([name for id_, name in items], dtype=str)
+        return ids, names
+
+    def lookup(self, ids):
+        # Names of the given IDs ("" for IDs not in the table)
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(self.ids) == 0:
+            return [""] * len(ids)
+        positions = np.minimum(np.searchsorted(self.ids, ids), len(self.ids) - 1)
+        found = self.ids[positions] == ids
+        return np.where(found, self.names[positions], "").tolist()
+
+    def content_ids(self):
+        # IDs whose tiles are written to a map (named, and not "empty")
+        return self.ids[(self.names != "") & (self.names != "empty")]
+
+    def name_ids(self):
+        # name -> ID, the lowest ID for names listed more than once
+        return dict(zip(self.names[::-1].tolist(), self.ids[::-1].tolist()))
+
+class WireGraph:
+    """Wire connections between object nodes as NumPy coordinate arrays.
+
+    Built from the node dicts filled by extract_entities: output_nodes maps
+    (x, y, node) of an output node's tile to the (x, y, node) keys of the input
+    nodes it connects to, and input_nodes maps (x, y, node) of an object's input
+    node (x, y being the object's tile) to the node's tile. starts/ends hold one
+    row per resolved connection, in output order; connections whose input node
+    was not found are kept in dangling as (output key, input key) pairs.
+    """
+
+    def __init__(self, output_nodes, input_nodes):
+        starts, ends, self.dangling = [], [], []
+        for out_key, in_keys in output_nodes.items():
+            for in_key in in_keys:
+                end = input_nodes.get(in_key)
+                if end is None:
+                    self.dangling.append((out_key, in_key))
+                    continue
+                starts.append(out_key[:2])
+                ends.append(end)
+        self.starts = np.array(starts, dtype=np.int64).reshape(-1, 2)
+        self.ends = np.array(ends, dtype=np.int64).reshape(-1, 2)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def describe_dangling(self, limit=10):
+        lines = [f"output node {o[2]} at ({o[0]}, {o[1]}) -> input node {i[2]} of the object at ({i[0]}, {i[1]})"
+                 for o, i in self.dangling[:limit]]
+        if len(self.dangling) > limit:
+            lines.append(f"... and {len(self.dangling) - limit} more")
+        return lines
+
+def label_components(mask, gap=0):
+    """Connected components of a 2D boolean mask, with NumPy only.
+
+    Cells belong to the same component when a chain of 8-connected steps joins
+    them, where every step may jump over up to gap unset cells. Returns
+    (labels, count): labels is an int32 array numbering components 1..count,
+    set on the mask's cells and on the gaps bridged between them, and 0
+    elsewhere.
+    """
+    height, width = mask.shape
+
+    # Every cell grows into a (gap + 1)-wide square anchored at it; two squares overlap or touch
+    # exactly when at most gap cells separate their cells, so the grown mask's 8-connected
+    # components are the wanted ones
+    grown = mask.copy()
+    for axis in (0, 1):
+        covered = 1
+        while covered < gap + 1:
+            step = min(covered, gap + 1 - covered)
+            shifted = np.zeros_like(grown)
+            if axis == 0:
+                shifted[step:] = grown[:-step]
+            else:
+                shifted[:, step:] = grown[:, :-step]
+            grown |= shifted
+            covered += step
+
+    # Horizontal runs of set cells, in row order; ends are exclusive
+    edges = np.diff(np.pad(grown, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+    run_rows, run_starts = np.nonzero(edges == 1)
+    run_ends = np.nonzero(edges == -1)[1]
+    if len(run_rows) == 0:
+        return np.zeros((height, width), dtype=np.int32), 0
+
+    # Runs of the row below that a run touches (8-connected) form a contiguous range of the run list:
+    # those ending at or after its start and starting at or before its end
+    stride = width + 2
+    start_keys = run_rows.astype(np.int64) * stride + run_starts
+    end_keys = run_rows.astype(np.int64) * stride + run_ends
+    below = (run_rows.astype(np.int64) - 1) * stride
+    first = np.searchsorted(end_keys, below + run_starts, side="left")
+    counts = np.maximum(np.searchsorted(start_keys, below + run_ends, side="right") - first, 0)
+    pair_runs = np.repeat(np.arange(len(run_rows)), counts)
+    pair_below = np.repeat(first - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+    # Union-find over the runs: hook each root onto the smaller root it touches, then shortcut every
+    # run to its root, until touching runs share their roots
+    parent = np.arange(len(run_rows))
+    while True:
+        a, b = parent[pair_runs], parent[pair_below]
+        if np.array_equal(a, b):
+            break
+        low = np.minimum(a, b)
+        np.minimum.at(parent, a, low)
+        np.minimum.at(parent, b, low)
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+    roots, run_labels = np.unique(parent, return_inverse=True)
+    run_labels = run_labels.astype(np.int32) + 1
+
+    # Paint the runs: +label at each start and -label at each end, summed along the rows
+    painted = np.zeros((height, width + 1), dtype=np.int32)
+    painted[run_rows, run_starts] = run_labels
+    painted[run_rows, run_ends] = -run_labels
+    return np.cumsum(painted, axis=1, dtype=np.int32)[:, :width], len(roots)
+
+class WorldToTiledConverter:
+    """Converts Starbound worlds to Tiled maps without any UI dependency.
+
+    status_callback, when given, receives short progress messages, and
+    progress_callback receives (stage, done, total) for the CONVERSION_STAGES
+    (total is 0 for stages without steps). Both may be called from whatever
+    thread runs the conversion. Setting cancel_event stops a conversion with
+    ConversionCancelled at the next region or stage boundary.
+    """
+
+    def __init__(self, status_callback=None, progress_callback=None, region_workers=1, stream_band_rows=0,
+                 region_cache_dir=None, infinite=False, profile_report=False, python_profile=False,
+                 trace_allocations=False, json_format="pretty", json_backend="auto", compression="zlib",
+                 compression_level=None, index_cache_dir=None, entity_types=ENTITY_TYPES, roi=None, auto_bbox=False,
+                 split_structures=False, structure_gap=0, min_structure_tiles=16, mod_layers=False,
+                 shared_tileset=False, layer_store_dir=None, delta_from=None):
+        self.status_callback = status_callback
+        self.progress_callback = progress_callback
+        self.cancel_event = threading.Event()
+        # Worker processes used to decode the regions of a single world (1 = decode in this process)
+        self.region_workers = region_workers
+        # Region rows converted at a time in streaming mode (0 = hold the whole world in memory)
+        self.stream_band_rows = stream_band_rows
+        # Folder for per-world caches of decoded regions (None = always decode everything)
+        self.region_cache_dir = region_cache_dir
+        # Write Tiled infinite maps made of per-region chunks instead of one data blob per layer
+        self.infinite = infinite
+        # Write a <map>.profile.json report of the stage timings next to every map,
+        # optionally with a cProfile capture and tracemalloc allocation figures
+        self.profile_report = profile_report
+        self.python_profile = python_profile
+        self.trace_allocations = trace_allocations
+        # "pretty" (indented, as always written) or "compact" (no whitespace) map and generated tileset files;
+        # compact files go through orjson when it is installed, unless json_backend is "json"
+        self.json_format = json_format
+        self.json_backend = json_backend
+        # Tile layer format (one of LAYER_COMPRESSIONS) and its level (None = the compressor's default)
+        self.compression = compression
+        self.compression_level = compression_level
+        # Folder for compiled config and tileset indexes, so starbound.config and the tilesets are only
+        # parsed again when they change (None = parse them on every load)
+        self.index_cache_dir = index_cache_dir
+        # Entity kinds (from ENTITY_TYPES) written to the map; entities of other kinds are skipped unparsed,
+        # and the entity layer of the world is not read at all when this is empty
+        self.entity_types = tuple(entity_types)
+        # Part of the world written to the map as (x0, y0, x1, y1) world tiles, x1/y1 exclusive (None = the whole
+        # world), or with auto_bbox the bounding box of the tiles with content; only regions overlapping it are read
+        self.roi = None if roi is None else tuple(roi)
+        self.auto_bbox = auto_bbox
+        # Write each group of connected foreground/background tiles (parts may be up to structure_gap tiles apart)
+        # of at least min_structure_tiles tiles as its own cropped map, instead of one map for the world
+        self.split_structures = split_structures
+        self.structure_gap = structure_gap
+        self.min_structure_tiles = min_structure_tiles
+        # Write foreground/background matmods to their own tile layers, resolved from tiles with only a "mod"
+        # property, instead of looking up a (material, colorVariant, mod) tile for every combination
+        self.mod_layers = mod_layers
+        # Append missing tiles to one generated tileset per tileset folder (SHARED_TILESET_NAME), whose local IDs
+        # never change, instead of writing a generated tileset per world
+        self.shared_tileset = shared_tileset
+        # Shared tileset of the current conversion (None = local IDs are numbered per world)
+        self.shared_tileset_path = None
+        # Folder to also save each world's resolved GID layers and entities to, as <world>.layers (see
+        # save_layer_store); such a folder can then be converted again in place of the world (None = no store)
+        self.layer_store_dir = layer_store_dir
+        # Earlier copy of the converted world: the map then only holds what changed since (see read_delta_layers)
+        self.delta_from = delta_from
+        # Compiled tilesets by (path, size, mtime), shared by load_tileset and generate_tilesets
+        self.tileset_indexes = {}
+
+        # Stage timings of the current (or last) conversion
+        self.profiler = StageProfiler()
+
+        # Shared by every conversion run with this converter
+        self.key_cache = TileKeyCache()
+
+    def report_status(self, text):
+        if self.status_callback:
+            self.status_callback(text)
+
+    def report_progress(self, stage, done=0, total=0):
+        if self.progress_callback:
+            self.progress_callback(stage, done, total)
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise ConversionCancelled("Conversion cancelled")
+
+    def start_stage(self, stage):
+        # Stage boundaries are safe points to stop: outputs are only written by the last stages
+        self.check_cancelled()
+        self.report_status(f"{stage}...")
+        self.report_progress(stage)
+
+    def worker_options(self):
+        # Constructor options replicated into batch worker processes
+        return {
+            "region_workers": self.region_workers,
+            "stream_band_rows": self.stream_band_rows,
+            "region_cache_dir": self.region_cache_dir,
+            "infinite": self.infinite,
+            "profile_report": self.profile_report,
+            "python_profile": self.python_profile,
+            "trace_allocations": self.trace_allocations,
+            "json_format": self.json_format,
+            "json_backend": self.json_backend,
+            "compression": self.compression,
+            "compression_level": self.compression_level,
+            "index_cache_dir": self.index_cache_dir,
+            "entity_types": self.entity_types,
+            "roi": self.roi,
+            "auto_bbox": self.auto_bbox,
+            "split_structures": self.split_structures,
+            "structure_gap": self.structure_gap,
+            "min_structure_tiles": self.min_structure_tiles,
+            "mod_layers": self.mod_layers,
+            "shared_tileset": self.shared_tileset,
+            "layer_store_dir": self.layer_store_dir,
+            "delta_from": self.delta_from,
+        }
 
-        # Output tileset folder (single folder)
-        tk.Label(self.root, text="Output tileset folder:").grid(row=row, column=0, sticky="w")
-        tk.Entry(self.root, textvariable=self.tileset_save_path, width=50).grid(row=row, column=1)
-        tk.Button(self.root, text="Browse", command=self.select_tileset_save).grid(row=row, column=2)
-        row += 1
+    def write_json(self, data, path, ensure_ascii=True):
+        if self.json_format != "compact":
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=4, ensure_ascii=ensure_ascii)
+            return
 
-        # Output Tiled map folder
-        tk.Label(self.root, text="Output Tiled map folder:").grid(row=row, column=0, sticky="w")
-        tk.Entry(self.root, textvariable=self.map_save_path, width=50).grid(row=row, column=1)
-        tk.Button(self.root, text="Browse", command=self.select_map_save).grid(row=row, column=2)
-        row += 1
+        if orjson is not None and self.json_backend != "json":
+            try:
+                encoded = orjson.dumps(data)
+            except TypeError:
+                # Values orjson cannot serialize (e.g. integers beyond 64 bits) fall back to the json module
+                encoded = None
+            if encoded is not None:
+                with open(path, "wb") as f:
+                    f.write(encoded)
+                return
+        elif self.json_backend == "orjson":
+            raise ValueError("The orjson JSON backend was requested but orjson is not installed")
+
+        # json.dump encodes in pieces and writes them as it goes, so the whole document never sits in memory
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"), ensure_ascii=ensure_ascii)
+
+    def load_config(self, config_path):
+        # material/mod/liquid become IdNameTables; wire stays the object -> node offsets dict
+        if self.index_cache_dir:
+            index = FileIndexCache(self.index_cache_dir, "config").get(config_path, self.compile_config)
+        else:
+            with open(config_path, "rb") as f:
+                index = self.compile_config(f.read())
+        return {
+            "material": IdNameTable(*index["material"]),
+            "mod": IdNameTable(*index["mod"]),
+            "liquid": IdNameTable(*index["liquid"]),
+            "wire": index["wire"],
+        }
 
-        # Progress bar
-        tk.Label(self.root, text="Progress:").grid(row=row, column=0, sticky="w")
-        self.progress_bar = ttk.Progressbar(self.root, mode='indeterminate')
-        self.progress_bar.grid(row=row, column=1, sticky="ew", padx=(0, 10))
-        row += 1
+    def compile_config(self, raw):
+        # Only plain values and arrays, so the cached index does not depend on how this module was imported
+        tiledConfig = json.loads(raw.decode("utf-8"))['worldToTiled']
+        return {
+            "material": IdNameTable.compile(tiledConfig['material']),
+            "mod": IdNameTable.compile(tiledConfig['mod']),
+            "liquid": IdNameTable.compile(tiledConfig['liquid']),
+            "wire": tiledConfig['wire'],
+        }
 
-        # Status label
-        self.status_label = tk.Label(self.root, text="Ready", fg="blue")
-        self.status_label.grid(row=row, column=0, columnspan=3, sticky="w")
-        row += 1
+    def load_tileset(self, filepath, name):
+        index = self.tileset_index(filepath)
+        return {
+            "name": name,
+            "tilecount": index["tilecount"],
+            "material_map": index["material_map"]
+        }
 
-        # Run button
-        tk.Button(self.root, text="Run Conversion", command=self.run_conversion, bg="#4CAF50", fg="white").grid(row=row, column=0, columnspan=3, pady=10)
+    def tileset_index(self, filepath):
+        # Compiled tileset ({"tilecount", "material_map"}), parsed at most once per file version:
+        # remembered in memory for this converter and kept in the index cache folder across runs
+        stat = os.stat(filepath)
+        memo_key = (os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns)
+        index = self.tileset_indexes.get(memo_key)
+        if index is None:
+            if self.index_cache_dir:
+                index = FileIndexCache(self.index_cache_dir, "tileset").get(
+                    filepath, lambda raw: self.compile_tileset(raw, filepath))
+            else:
+                with open(filepath, "rb") as f:
+                    index = self.compile_tileset(f.read(), filepath)
+            self.tileset_indexes[memo_key] = index
+        return index
 
-    def load_tileset(self, filepath, name):
-        with open(filepath, encoding="utf-8") as f:
-            data = json.load(f)
+    def compile_tileset(self, raw, filepath):
+        data = json.loads(raw.decode("utf-8"))
         tileprops = data.get("tileproperties", {})
         material_to_id = {}
 
@@ -97,6 +793,10 @@ class StarboundToTiledUI:
             # material format
             material_name = props.get("material")
             if not material_name:
+                # Matmod tiles (only a mod) are keyed (mod,)
+                mod = props.get("mod")
+                if mod and mod.strip() != "":
+                    material_to_id[(mod,)] = tile_id
                 continue
 
             color_variant_str = props.get("colorVariant")
@@ -111,242 +811,302 @@ class StarboundToTiledUI:
             key = (material_name, color_variant, mod)
             material_to_id[key] = tile_id
 
+        tilecount = data.get("tilecount")
+        if tilecount is None:
+            raise ValueError(f"tilecount not found in {filepath}")
+
         return {
-            "name": name,
+            "tilecount": tilecount,
             "material_map": material_to_id
         }
 
-    def select_config(self):
-        path = filedialog.askopenfilename(title="Select starbound.config", filetypes=[("Starbound Config File", "*.config")])
-        if path:
-            self.config_path.set(path)
-
-    def select_world(self):
-        path = filedialog.askopenfilename(title="Select .world file", filetypes=[("Starbound World File", "*.world;*.shipworld")])
-        if path:
-            self.world_path.set(path)
-
-    def add_tilesets(self):
-        paths = filedialog.askopenfilenames(title="Select tilesets", filetypes=[("Starbound Tilesets File", "*.json")])
-        for p in paths:
-            if p not in self.tileset_paths:
-                self.tileset_paths.append(p)
-                self.tileset_table.insert("", tk.END, values=(p,))
-
-    def select_tileset_save(self):
-        path = filedialog.askdirectory(title="Select output generated tileset folder")
-        if path:
-            self.tileset_save_path.set(path)
-
-    def select_map_save(self):
-        path = filedialog.askdirectory(title="Select output Tiled dungeon map folder")
-        if path:
-            self.map_save_path.set(path)
-
-    def run_conversion(self):
-        if not self.config_path.get() or not self.world_path.get() or not self.tileset_paths \
-           or not self.tileset_save_path.get() or not self.map_save_path.get():
-            messagebox.showerror("Error", "Please fill in all paths.")
-            return
+    def resolve_material_key(self, material, color_variant, mod, all_tilesets):
+        color_variant_key = None if color_variant == 0 else color_variant
+
+        for tileset in all_tilesets:
+            material_map = tileset.get("material_map", {})
+
+            try_keys = [
+                (material, color_variant_key, mod),
+                (material, None, mod) if color_variant_key is not None else None,
+                (material, color_variant_key, None) if mod is not None else None,
+                (material, None, None) if color_variant_key is None and mod is None else None,
+            ]
+
+            for key in try_keys:
+                if key and key in material_map:
+                    if key[1] != color_variant_key and color_variant_key is not None:
+                        continue
+                    if key[2] != mod and mod is not None:
+                        continue
+
+                    # Found in existing tileset
+                    return tileset["name"], int(material_map[key])
+
+        return None
+
+    def resolve_liquid_key(self, liquid, source, all_tilesets):
+        key = (liquid, source)
+        for tileset in all_tilesets:
+            material_map = tileset.get("material_map", {})
+            if key in material_map:
+                return tileset["name"], int(material_map[key])
+        return None
+
+    def resolve_mod_key(self, mod, all_tilesets):
+        key = (mod,)
+        for tileset in all_tilesets:
+            material_map = tileset.get("material_map", {})
+            if key in material_map:
+                return tileset["name"], int(material_map[key])
+        return None
+
+    def describe_missing_key(self, key, local_id):
+        if len(key) == 1:
+            return f"Mod '{key[0]}' not found in any tileset. Assigning local ID '{local_id}'"
+        if len(key) == 2:
+            liquid, source = key
+            return f"Liquid '{liquid}' with source={source} not found. Assigning local ID '{local_id}'"
+
+        material, color_variant, mod = key
+        if color_variant == 0:
+            return (f"Material '{material}'"
+                + (f" and mod '{mod}'" if mod else "")
+                + f" not found in any tileset. Assigning local ID '{local_id}'")
+        return (f"Material '{material}' with colorVariant '{color_variant}'"
+            + (f" and mod '{mod}'" if mod else "")
+            + f" not found in any tileset. Assigning local ID '{local_id}'")
+
+    def compact_ids(self, ids):
+        # Map the IDs present in a layer to 0..n-1 so lookup tables only cover used IDs
+        present = np.flatnonzero(np.bincount(ids.ravel(), minlength=1))
+        remap = np.zeros(int(present[-1]) + 1, dtype=np.intp)
+        remap[present] = np.arange(len(present))
+        return present, remap[ids]
+
+    def ids_to_names(self, ids, id_to_name, label):
+        # id_to_name: IdNameTable of the config section
+        names = id_to_name.lookup(ids)
+        for id_, name in zip(ids.tolist(), names):
+            if name == "":
+                print(f"Failed to convert {label} ID '{id_}' to {label} name.")
+        return names
+
+    def assign_missing_gids(self, lut, lut_keys, missing_keys, missing_tile_map, generated_firstgid):
+        # Gather the cells whose key is missing and order the keys by first appearance (row-major)
+        is_missing = np.zeros(len(lut), dtype=bool)
+        is_missing[list(missing_keys)] = True
+        missing_cells = lut_keys.ravel()[is_missing[lut_keys.ravel()]]
+        unique_keys, first_index = np.unique(missing_cells, return_index=True)
+        ordered_keys = unique_keys[np.argsort(first_index)].tolist()
+
+        new_keys = [key for key in dict.fromkeys(missing_keys[lut_key] for lut_key in ordered_keys)
+                    if key not in missing_tile_map]
+        for report_key, local_id in zip(new_keys, self.generated_local_ids(new_keys, missing_tile_map)):
+            print(self.describe_missing_key(report_key, local_id))
+            missing_tile_map[report_key] = local_id
+
+        for lut_key in ordered_keys:
+            lut[lut_key] = generated_firstgid + missing_tile_map[missing_keys[lut_key]]
+
+    def generated_local_ids(self, keys, missing_tile_map):
+        # Local IDs for keys new to this world: numbered per world, or taken from the shared tileset
+        if self.shared_tileset_path is None:
+            return range(len(missing_tile_map), len(missing_tile_map) + len(keys))
+        shared = self.add_shared_tiles(self.shared_tileset_path, keys)
+        return [shared[key] for key in keys]
+
+    def add_shared_tiles(self, path, keys):
+        # Appends the keys not in the shared tileset yet and returns its whole key -> local ID map. The file is
+        # re-read under the lock and replaced atomically, so parallel conversions never hand out an ID twice.
+        with file_lock(path):
+            tile_map = {}
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    tileset = json.loads(f.read().decode("utf-8"))
+                for local_id, props in tileset.get("tileproperties", {}).items():
+                    tile_map[self.properties_key(props)] = int(local_id)
+
+            new_keys = [key for key in dict.fromkeys(keys) if key not in tile_map]
+            if new_keys or not os.path.exists(path):
+                for key in new_keys:
+                    tile_map[key] = len(tile_map)
+                temp_path = f"{path}.{os.getpid()}.tmp"
+                self.write_json(self.generate_missing_tileset_from_map(tile_map, "generated_tiles"), temp_path, ensure_ascii=False)
+                os.replace(temp_path, path)
+        return tile_map
+
+    def material_layer_to_gids(self, material_ids, variants, mod_ids, material_id_to_name, mod_id_to_name, all_tilesets, firstgids, missing_tile_map):
+        material_values, material_index = self.compact_ids(material_ids)
+        if mod_ids is None:
+            # Mods are written to their own layer: every cell takes the "no mod" key
+            mod_values, mod_index, mod_names = np.zeros(1, dtype=np.intp), np.zeros_like(material_index), [""]
+        else:
+            mod_values, mod_index = self.compact_ids(mod_ids)
+            mod_names = self.ids_to_names(mod_values, mod_id_to_name, "material mod")
+        # colorVariant 0-8 is valid; anything above shares a single "invalid" slot
+        variant_index = np.minimum(variants, MAX_COLOR_VARIANT + 1)
+
+        material_names = self.ids_to_names(material_values, material_id_to_name, "material")
+
+        # Dense table indexed by (material, colorVariant, mod), filled only for combinations present
+        lut_shape = (len(material_values), MAX_COLOR_VARIANT + 2, len(mod_values))
+        lut_keys = np.ravel_multi_index((material_index, variant_index, mod_index), lut_shape)
+        lut = np.zeros(int(np.prod(lut_shape)), dtype=np.uint32)
+
+        present_keys = np.flatnonzero(np.bincount(lut_keys.ravel(), minlength=1))
+        missing_keys = {}
+        for lut_key, m, color_variant, d in zip(present_keys.tolist(), *(a.tolist() for a in np.unravel_index(present_keys, lut_shape))):
+            material = material_names[m]
+            if material in ("", "empty") or color_variant > MAX_COLOR_VARIANT:
+                continue
 
-        # Start progress indication
-        self.progress_bar.start()
-        self.status_label.config(text="Starting conversion...", fg="orange")
-        self.root.update()
+            mod = mod_names[d]
+            mod = None if mod in ("", "empty") else mod
 
-        # Actual conversion logic goes here
-        self.convert_world_to_tiled()
+            found = self.key_cache.lookup(
+                (material, color_variant, mod),
+                lambda: self.resolve_material_key(material, color_variant, mod, all_tilesets))
+            if found:
+                lut[lut_key] = firstgids[found[0]] + found[1]
+            else:
+                missing_keys[lut_key] = (material, color_variant, mod)
 
-        # Stop progress indication
-        self.progress_bar.stop()
-        self.status_label.config(text="Ready", fg="blue")
+        if missing_keys:
+            self.assign_missing_gids(lut, lut_keys, missing_keys, missing_tile_map, firstgids["generated_tiles"])
 
-    def material_names_to_tuples_with_color_variant(self, material_array, all_tilesets, missing_tile_map):
-        height = len(material_array)
-        width = len(material_array[0]) if height > 0 else 0
-        result = np.empty((height, width), dtype=object)
-        already_reported = set()
+        return lut[lut_keys]
 
-        current_missing_local_id = len(missing_tile_map)  # Start from 0 or continue from previous
+    def mod_layer_to_gids(self, mod_ids, mod_id_to_name, all_tilesets, firstgids, missing_tile_map):
+        # Lookup table indexed by the compacted mod ID, filled only for the mods present
+        mod_values, mod_index = self.compact_ids(mod_ids)
+        mod_names = self.ids_to_names(mod_values, mod_id_to_name, "material mod")
+        lut = np.zeros(len(mod_values), dtype=np.uint32)
 
-        for y in range(height):
-            for x in range(width):
-                entry = material_array[y][x]
+        missing_keys = {}
+        for lut_key, mod in enumerate(mod_names):
+            if mod in ("", "empty"):
+                continue
+            found = self.key_cache.lookup((mod,), lambda: self.resolve_mod_key(mod, all_tilesets))
+            if found:
+                lut[lut_key] = firstgids[found[0]] + found[1]
+            else:
+                missing_keys[lut_key] = (mod,)
 
-                if (
-                    not entry or
-                    (isinstance(entry, str) and entry.strip() == "") or
-                    (isinstance(entry, (list, tuple)) and len(entry) > 0 and str(entry[0]).strip() == "")
-                ):
-                    result[y, x] = ("empty", np.uint32(0))
-                    continue
+        if missing_keys:
+            self.assign_missing_gids(lut, mod_index, missing_keys, missing_tile_map, firstgids["generated_tiles"])
 
-                if isinstance(entry, (list, tuple)):
-                    material = entry[0] if len(entry) > 0 else None
-                    color_variant = entry[1] if len(entry) > 1 else 0
-                    mod = entry[2] if len(entry) > 2 else None
-                else:
-                    material = entry
-                    color_variant = 0
-                    mod = None
+        return lut[mod_index]
 
-                if not isinstance(color_variant, int) or not (0 <= color_variant <= 8):
-                    result[y, x] = ("empty", np.uint32(0))
-                    continue
+    def liquid_layer_to_gids(self, liquid_ids, infinites, liquid_id_to_name, all_tilesets, firstgids, missing_tile_map):
+        # Dense table indexed by (liquid, source); liquid IDs are uint8 so no compaction is needed
+        lut_keys = liquid_ids.astype(np.intp) * 2 + (infinites == 1)
+        lut = np.zeros(256 * 2, dtype=np.uint32)
 
-                color_variant_key = None if color_variant == 0 else color_variant
-                mod = None if not mod or str(mod).strip() == "" else mod
-
-                found = False
-
-                for tileset in all_tilesets:
-                    material_map = tileset.get("material_map", {})
-
-                    try_keys = [
-                        (material, color_variant_key, mod),
-                        (material, None, mod) if color_variant_key is not None else None,
-                        (material, color_variant_key, None) if mod is not None else None,
-                        (material, None, None) if color_variant_key is None and mod is None else None,
-                    ]
-
-                    for key in try_keys:
-                        if key and key in material_map:
-                            if key[1] != color_variant_key and color_variant_key is not None:
-                                continue
-                            if key[2] != mod and mod is not None:
-                                continue
-
-                            # Found in existing tileset
-                            result[y, x] = (tileset["name"], np.uint32(material_map[key]))
-                            found = True
-                            break
-                    if found:
-                        break
-
-                if not found:
-                    report_key = (material, color_variant, mod)
-                    if report_key not in already_reported:
-                        already_reported.add(report_key)
-
-                    if report_key not in missing_tile_map:
-                        if color_variant == 0:
-                            print(f"Material '{material}'"
-                                + (f" and mod '{mod}'" if mod else "")
-                                + f" not found in any tileset. Assigning local ID '{current_missing_local_id}'")
-                        else:
-                            print(f"Material '{material}' with colorVariant '{color_variant}'"
-                                + (f" and mod '{mod}'" if mod else "")
-                                + f" not found in any tileset. Assigning local ID '{current_missing_local_id}'")
-                        missing_tile_map[report_key] = current_missing_local_id
-                        current_missing_local_id += 1
-
-                    local_id = missing_tile_map[report_key]
-                    result[y, x] = ("generated_tiles", np.uint32(local_id))
+        present_keys = np.flatnonzero(np.bincount(lut_keys.ravel(), minlength=1))
+        liquid_names = dict(zip(
+            np.unique(present_keys // 2).tolist(),
+            self.ids_to_names(np.unique(present_keys // 2), liquid_id_to_name, "liquid")
+        ))
 
-        return result
+        missing_keys = {}
+        for lut_key in present_keys.tolist():
+            liquid = liquid_names[lut_key // 2]
+            if liquid in ("", "empty"):
+                continue
 
-    def liquid_names_to_tuples(self, liquid_array, all_tilesets, missing_tile_map):
-        def is_truthy(val):
-            # Handle various true values
-            if isinstance(val, bool):
-                return val
-            if isinstance(val, int):
-                return val == 1
-            if isinstance(val, str):
-                return val.strip().lower() in ("true", "1", "yes")
-            return False
-
-        height = len(liquid_array)
-        width = len(liquid_array[0]) if height > 0 else 0
-        result = np.empty((height, width), dtype=object)
-        already_reported = set()
-
-        current_missing_local_id = len(missing_tile_map)
-
-        for y in range(height):
-            for x in range(width):
-                entry = liquid_array[y][x]
-
-                # Handle empty cells
-                if (
-                    not entry or
-                    (isinstance(entry, str) and entry.strip() == "") or
-                    (isinstance(entry, (list, tuple)) and len(entry) > 0 and str(entry[0]).strip() == "")
-                ):
-                    result[y, x] = ("empty", np.uint32(0))
-                    continue
+            source = lut_key % 2 == 1
+            found = self.key_cache.lookup(
+                (liquid, source),
+                lambda: self.resolve_liquid_key(liquid, source, all_tilesets))
+            if found:
+                lut[lut_key] = firstgids[found[0]] + found[1]
+            else:
+                missing_keys[lut_key] = (liquid, source)
 
-                # Parse
-                if isinstance(entry, (list, tuple)):
-                    liquid = entry[0] if len(entry) > 0 else None
-                    raw_source = entry[1] if len(entry) > 1 else False
-                else:
-                    liquid = entry
-                    raw_source = False
-
-                # Clean up source value (1, "true", "1", True etc. → True)
-                source = is_truthy(raw_source)
-
-                # Find in tileset
-                found = False
-                for tileset in all_tilesets:
-                    material_map = tileset.get("material_map", {})
-                    key = (liquid, source)
-                    if key in material_map:
-                        result[y, x] = (tileset["name"], np.uint32(material_map[key]))
-                        found = True
-                        break
-
-                if not found:
-                    report_key = (liquid, source)
-                    if report_key not in already_reported:
-                        print(f"Liquid '{liquid}' with source={source} not found. Assigning local ID '{current_missing_local_id}'")
-                        already_reported.add(report_key)
-
-                    if report_key not in missing_tile_map:
-                        missing_tile_map[report_key] = current_missing_local_id
-                        current_missing_local_id += 1
-
-                    local_id = missing_tile_map[report_key]
-                    result[y, x] = ("generated_tiles", np.uint32(local_id))
+        if missing_keys:
+            self.assign_missing_gids(lut, lut_keys, missing_keys, missing_tile_map, firstgids["generated_tiles"])
 
-        return result
+        return lut[lut_keys]
 
-    def safe_get_entities(self, world, rx, ry):
+    def read_region_blob(self, world, layer, rx, ry):
+        # Compressed value stored in the world BTree, or None when the region has no such layer
         try:
-            return world.get_entities(rx, ry)
+            return starbound.BTreeDB5.get(world, struct.pack('>BHH', layer, rx, ry))
         except KeyError:
+            return None
+
+    def wanted_entity_names(self):
+        return {ENTITY_TYPE_NAMES[kind] for kind in self.entity_types}
+
+    def read_entities_blob(self, entity_blob, entity_names=None):
+        # Only entities named in entity_names (None = all) are parsed; the others are skipped past after their header
+        if entity_blob is None:
             return []
+        stream = io.BytesIO(zlib.decompress(entity_blob))
+        count = sbon.read_varint(stream)
+        entities = []
+        for _ in range(count):
+            # Same layout as starbound.read_versioned_json: name, version (only after a true flag), SBON data
+            name = sbon.read_string(stream)
+            version = None if stream.read(1) == b'\x00' else struct.unpack('>i', stream.read(4))[0]
+            if entity_names is None or name in entity_names:
+                entities.append(starbound.VersionedJSON(name, version, sbon.read_dynamic(stream)))
+            else:
+                skip_sbon_dynamic(stream)
+        return entities
+
+    def open_region_cache(self, world_name, world, object_nodes, area=None):
+        world_path = os.path.abspath(world_name)
+        cache_name = hashlib.sha1(world_path.encode("utf-8")).hexdigest()[:16] + "_" + os.path.basename(world_name) + ".cache"
+        fingerprint = hashlib.sha1(json.dumps(
+            [REGION_CACHE_VERSION, world.height, object_nodes, sorted(self.entity_types), area], sort_keys=True).encode("utf-8")).hexdigest()
+        return RegionCache(os.path.join(self.region_cache_dir, cache_name), fingerprint)
 
-    def extract_entities(self, entities, world_height, object_nodes, object_input_nodes, object_output_nodes):
+    def extract_entities(self, entities, world_height, object_nodes, object_input_nodes, object_output_nodes, area=None):
         monster_list = []
         npc_list = []
         object_list = []
         vehicle_list = []
 
+        # With an area (x0, y0, x1, y1), positions are made relative to it and entities outside it are left out
+        if area is None:
+            offset_x, offset_y, map_height = 0, 0, world_height
+        else:
+            offset_x, offset_y, map_height = area[0], area[1], area[3] - area[1]
+
+        def outside(x, y):
+            return area is not None and not (area[0] <= x < area[2] and area[1] <= y < area[3])
+
         for entity in entities:
-            if getattr(entity, "name", None) == "MonsterEntity":
+            if getattr(entity, "name", None) == "MonsterEntity" and "monsters" in self.entity_types:
                 data = entity.data
                 persistent = data.get("monsterVariant", {}).get("uniqueParameters", {}).get("persistent", False)
                 if persistent:
                     monster_variant = data.get("monsterVariant", {})
                     position = data.get("movementState", {}).get("position", [0, 0])
+                    position = [int(round(position[0])), int(round(position[1]))]
+                    if outside(*position):
+                        continue
                     obj = {
 #                        "level": data.get("monsterLevel"),
-                        "position": [int(round(position[0])), int(round(position[1]))],
+                        "position": [position[0] - offset_x, position[1] - offset_y],
                         "seed": monster_variant.get("seed"),
                         "type": monster_variant.get("type"),
                         "uniqueParameters": monster_variant.get("uniqueParameters", {})
                     }
 #                    print(monster_variant.get("uniqueParameters", {}))
                     monster_list.append(obj)
-            elif getattr(entity, "name", None) == "NpcEntity":
+            elif getattr(entity, "name", None) == "NpcEntity" and "npcs" in self.entity_types:
                 data = entity.data.get("npcVariant", {})
                 position = entity.data.get("movementController", {}).get("position", [0, 0])
+                position = [int(round(position[0])), int(round(position[1]))]
+                if outside(*position):
+                    continue
                 obj = {
 #                        "level": data.get("level"),
                     "overrides": data.get("overrides", {}),
-                    "position": [int(round(position[0])), int(round(position[1]))],
+                    "position": [position[0] - offset_x, position[1] - offset_y],
                     "seed": data.get("seed"),
                     "species": data.get("species"),
                     "typeName": data.get("typeName")
@@ -355,7 +1115,9 @@ class StarboundToTiledUI:
                 npc_list.append(obj)
             elif getattr(entity, "name", None) == "ObjectEntity":
                 data = entity.data
-                tile_position = [data.get("tilePosition")[0], world_height - data.get("tilePosition")[1] - 1]
+                if outside(*data.get("tilePosition")):
+                    continue
+                tile_position = [data.get("tilePosition")[0] - offset_x, map_height - (data.get("tilePosition")[1] - offset_y) - 1]
                 object_name = data.get("name")
                 obj = {
                     "name": object_name,
@@ -367,34 +1129,39 @@ class StarboundToTiledUI:
                     "outputWireNodes": data.get("outputWireNodes", [])
                 }
 
-                input_nodes = data.get("inputWireNodes", [])
-                if isinstance(input_nodes, list) and input_nodes:
-                    for i, pos in enumerate(input_nodes):
-                        connections = pos.get("connections", []) if isinstance(pos, dict) else []
-                        if connections:  # Only when connections list is not empty
-                            offset = object_nodes[object_name][f"i_{i}"]
-                            object_input_nodes[f"{tile_position[0]}_{tile_position[1]}_i_{i}"] = [tile_position[0] + offset[0], tile_position[1] - offset[1]]
-
-                output_nodes = data.get("outputWireNodes", [])
-                if isinstance(output_nodes, list) and output_nodes:
-                    for i, pos in enumerate(output_nodes):
-                        connections = pos.get("connections", []) if isinstance(pos, dict) else []
-                        if connections:  # Only when connections list is not empty
-                            offset = object_nodes[object_name][f"o_{i}"]
-                            for conn in connections:
-                                coord = [conn[0][0], world_height - conn[0][1] - 1]
-                                key = f"{coord[0]}_{coord[1]}_i_{conn[1]}"
-                                object_output_nodes.setdefault(f"{tile_position[0] + offset[0]}_{tile_position[1] - offset[1]}_o_{i}", []).append(key)
-
-                object_list.append(obj)
-
-            elif getattr(entity, "name", None) == "VehicleEntity":
+                if "wiring" in self.entity_types:
+                    input_nodes = data.get("inputWireNodes", [])
+                    if isinstance(input_nodes, list) and input_nodes:
+                        for i, pos in enumerate(input_nodes):
+                            connections = pos.get("connections", []) if isinstance(pos, dict) else []
+                            if connections:  # Only when connections list is not empty
+                                offset = object_nodes[object_name][f"i_{i}"]
+                                object_input_nodes[(tile_position[0], tile_position[1], i)] = (tile_position[0] + offset[0], tile_position[1] - offset[1])
+
+                    output_nodes = data.get("outputWireNodes", [])
+                    if isinstance(output_nodes, list) and output_nodes:
+                        for i, pos in enumerate(output_nodes):
+                            connections = pos.get("connections", []) if isinstance(pos, dict) else []
+                            if connections:  # Only when connections list is not empty
+                                offset = object_nodes[object_name][f"o_{i}"]
+                                for conn in connections:
+                                    coord = [conn[0][0] - offset_x, map_height - (conn[0][1] - offset_y) - 1]
+                                    key = (coord[0], coord[1], conn[1])
+                                    object_output_nodes.setdefault((tile_position[0] + offset[0], tile_position[1] - offset[1], i), []).append(key)
+
+                if "objects" in self.entity_types:
+                    object_list.append(obj)
+
+            elif getattr(entity, "name", None) == "VehicleEntity" and "vehicles" in self.entity_types:
                 data = entity.data
                 position = data.get("state", {}).get("movement", {}).get("position", [0, 0])
+                position = [int(position[0]), int(position[1])]
+                if outside(*position):
+                    continue
                 obj = {
                     "name": data.get("name", {}),
                     "dynamicConfig": data.get("dynamicConfig", {}),
-                    "position": [int(position[0]), int(position[1])],
+                    "position": [position[0] - offset_x, position[1] - offset_y],
                 }
                 vehicle_list.append(obj)
 #                print(entity.data)
@@ -402,37 +1169,135 @@ class StarboundToTiledUI:
 
         return monster_list, npc_list, object_list, vehicle_list
 
-    def named_to_gid(self, tileset_name, local_id, tilesets):
-        if tileset_name == "empty":
-            return 0
-        for ts in tilesets:
-            if ts["name"] == tileset_name:
-                return ts["firstgid"] + local_id
-        raise ValueError(f"Unknown tileset name: {tileset_name}")
-
-    def encode_map(self, named_tile_map, tilesets):
-        # named_tile_map: 2D array of (tileset_name, local_id)
-        height, width = named_tile_map.shape
-        gids = np.zeros((height * width,), dtype=np.uint32)
-        for i in range(height):
-            for j in range(width):
-                tileset_name, local_id = named_tile_map[i, j]
-                gids[i * width + j] = self.named_to_gid(tileset_name, local_id, tilesets)
-        # Compression + base64 encoding
-        raw_bytes = gids.tobytes()
-        compressed = zlib.compress(raw_bytes)
-        encoded = base64.b64encode(compressed).decode('utf-8')
-        return encoded
-
-    def generate_tilesets(self, tileset_paths, relative_to="tiled/packed/dungeons/converted"):
+    def tileset_firstgids(self, all_tilesets, generated_name="generated_tiles"):
+        # Same layout as generate_tilesets, with the generated tileset appended last
+        firstgids = {}
+        current_gid = 1
+        for tileset in all_tilesets:
+            firstgids.setdefault(tileset["name"], current_gid)
+            current_gid += tileset["tilecount"]
+        firstgids.setdefault(generated_name, current_gid)
+        return firstgids
+
+    def layer_compressor(self, size):
+        # Streaming compressor for the size bytes of one tile layer, as selected by self.compression
+        if self.compression not in LAYER_COMPRESSIONS:
+            raise ValueError(f"Unknown layer compression '{self.compression}' (expected one of {', '.join(LAYER_COMPRESSIONS)})")
+        level = self.compression_level
+        if self.compression == "zlib":
+            return zlib.compressobj(-1 if level is None else level)
+        if self.compression == "gzip":
+            # wbits 31 writes a gzip header (with no timestamp, so output is reproducible)
+            return zlib.compressobj(-1 if level is None else level, zlib.DEFLATED, 31)
+        if self.compression == "zstd":
+            if zstandard is None:
+                raise ValueError("zstd layer compression needs the zstandard package (pip install zstandard)")
+            # The frame records the content size, which decoders such as Tiled's rely on
+            return zstandard.ZstdCompressor(level=ZSTD_DEFAULT_LEVEL if level is None else level).compressobj(size=size)
+        return PassthroughCompressor()
+
+    def compress_layer(self, raw_bytes):
+        compressor = self.layer_compressor(len(raw_bytes))
+        return compressor.compress(raw_bytes) + compressor.flush()
+
+    def decompress_layer(self, data, compression):
+        # Inverse of compress_layer for the base64-decoded bytes of a layer with the given "compression" field
+        if compression == "zlib":
+            return zlib.decompress(data)
+        if compression == "gzip":
+            return zlib.decompress(data, 31)
+        if compression == "zstd":
+            if zstandard is None:
+                raise ValueError("zstd compressed layers need the zstandard package (pip install zstandard)")
+            return zstandard.ZstdDecompressor().decompress(data)
+        if not compression:
+            return data
+        raise ValueError(f"Unknown layer compression '{compression}'")
+
+    def layer_gids(self, data, compression, width, height):
+        # GIDs of one layer (or chunk) "data" value in Tiled row order, without Tiled's flip flags
+        if isinstance(data, list):
+            gids = np.array(data, dtype=np.uint32)
+        else:
+            gids = np.frombuffer(self.decompress_layer(base64.b64decode(data), compression), dtype="<u4")
+        return (gids & TILED_GID_MASK).reshape(height, width)
+
+    def layer_data_value(self, data):
+        # Compressed layer bytes as stored in the map: a base64 string, or a list of GIDs for CSV
+        if self.compression == "csv":
+            return np.frombuffer(data, dtype=np.uint32).tolist()
+        return base64.b64encode(data).decode('utf-8')
+
+    def layer_format(self):
+        # Tile layer "encoding"/"compression" fields of the map JSON
+        if self.compression == "csv":
+            return {"encoding": "csv"}
+        return {"compression": "" if self.compression == "none" else self.compression, "encoding": "base64"}
+
+    def map_compression_level(self):
+        # Map header "compressionlevel": -1 is Tiled's "default level"
+        if self.compression in ("none", "csv") or self.compression_level is None:
+            return -1
+        return self.compression_level
+
+    def encode_map(self, gid_map):
+        # gid_map: 2D uint32 array of global tile IDs; contiguous arrays (such as layer store memmaps) are
+        # compressed in place instead of being copied to bytes first
+        raw_bytes = memoryview(np.ascontiguousarray(gid_map, dtype=np.uint32)).cast("B")
+        # Compression + base64 encoding (or a plain GID list for CSV)
+        return self.layer_data_value(self.compress_layer(raw_bytes))
+
+    def encode_chunks(self, gid_map, world_height, y0=0, origin=(0, 0)):
+        # gid_map: layer in Tiled row order covering map rows y0 and up, where the map's bottom-left tile is the
+        # world tile at origin. It is padded to whole regions so every chunk is one 32x32 Starbound region
+        # (chunks of a cropped map may start left of or above it); empty chunks are left out.
+        height, width = gid_map.shape
+        pad_left = origin[0] % REGION_SIZE
+        pad_bottom = (origin[1] + y0) % REGION_SIZE
+        padded = np.pad(gid_map, ((-(pad_bottom + height) % REGION_SIZE, pad_bottom),
+                                  (pad_left, -(pad_left + width) % REGION_SIZE)))
+        chunk_top = world_height - y0 - (padded.shape[0] - pad_bottom)
+
+        rows, cols = padded.shape[0] // REGION_SIZE, padded.shape[1] // REGION_SIZE
+        blocks = padded.reshape(rows, REGION_SIZE, cols, REGION_SIZE).swapaxes(1, 2)
+        occupied = np.argwhere(blocks.any(axis=(2, 3))).tolist()
+
+        def encode_chunk(position):
+            i, j = position
+            return {
+                "data": self.encode_map(blocks[i, j]),
+                "height": REGION_SIZE,
+                "width": REGION_SIZE,
+                "x": j * REGION_SIZE - pad_left,
+                "y": chunk_top + i * REGION_SIZE
+            }
+
+        # zlib and zstd release the GIL, so chunks compress in parallel on threads
+        with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+            return list(pool.map(encode_chunk, occupied))
+
+    def chunk_bounds(self, chunks):
+        if not chunks:
+            return {"startx": 0, "starty": 0, "width": 0, "height": 0}
+        start_x = min(chunk["x"] for chunk in chunks)
+        start_y = min(chunk["y"] for chunk in chunks)
+        return {
+            "startx": start_x,
+            "starty": start_y,
+            "width": max(chunk["x"] + chunk["width"] for chunk in chunks) - start_x,
+            "height": max(chunk["y"] + chunk["height"] for chunk in chunks) - start_y
+        }
+
+    def generate_tilesets(self, tileset_paths, relative_to="tiled/packed/dungeons/converted", tilecounts=None):
+        # tilecounts: known sizes by path, for the tilesets this conversion wrote, which are not worth indexing
         tilesets = []
         current_gid = 1
         for path, name in tileset_paths:
-            with open(path, encoding="utf-8") as f:
-                data = json.load(f)
-            tilecount = data.get("tilecount")
-            if tilecount is None:
-                raise ValueError(f"tilecount not found in {path}")
+            if tilecounts and path in tilecounts:
+                tilecount = tilecounts[path]
+            else:
+                # Shares the parse (or cached index) with load_tileset
+                tilecount = self.tileset_index(path)["tilecount"]
             relative_path = os.path.relpath(path, start=relative_to).replace("\\", "/")
             tilesets.append({
                 "firstgid": current_gid,
@@ -442,6 +1307,36 @@ class StarboundToTiledUI:
             current_gid += tilecount
         return tilesets
 
+    def missing_key_properties(self, key):
+        # Branch processing: material, liquid or matmod?
+        if len(key) == 1:
+            prop = {"mod": key[0]}
+        elif len(key) == 3:
+            # material tileset
+            material, color, mod = key
+            prop = {"material": material}
+            if color is not None and color != 0:
+                prop["colorVariant"] = str(color)
+            if mod:
+                prop["mod"] = str(mod)
+        elif len(key) == 2:
+            # liquid tileset
+            liquid, source = key
+            prop = {"liquid": liquid}
+            if source:
+                prop["source"] = "true"  # Only save when source is True
+        else:
+            raise ValueError(f"Unrecognized key format in missing_tile_map: {key}")
+        return prop
+
+    def properties_key(self, props):
+        # Inverse of missing_key_properties
+        if "liquid" in props:
+            return (props["liquid"], props.get("source") == "true")
+        if "material" in props:
+            return (props["material"], int(props.get("colorVariant", 0)), props.get("mod"))
+        return (props["mod"],)
+
     def generate_missing_tileset_from_map(self, missing_tile_map, tileset_name="generated_tiles"):
         tileset = {
             "name": tileset_name,
@@ -459,91 +1354,68 @@ class StarboundToTiledUI:
                 "image": "./../../../../tiled/packed/../packed/invalid.png"
             }
 
-            # Branch processing: material or liquid?
-            if len(key) == 3:
-                # material tileset
-                material, color, mod = key
-                prop = {"material": material}
-                if color is not None and color != 0:
-                    prop["colorVariant"] = str(color)
-                if mod:
-                    prop["mod"] = str(mod)
-            elif len(key) == 2:
-                # liquid tileset
-                liquid, source = key
-                prop = {"liquid": liquid}
-                if source:
-                    prop["source"] = "true"  # Only save when source is True
-            else:
-                raise ValueError(f"Unrecognized key format in missing_tile_map: {key}")
-
+            prop = self.missing_key_properties(key)
             tileset["tileproperties"][str(local_id)] = prop
 
         return tileset
 
     def build_polylines(self, object_output_nodes, object_input_nodes, starting_id=1000):
-        polylines = []
-        current_id = starting_id
-
-        for out_key, in_keys in object_output_nodes.items():
-            # Extract starting coordinates from key
-            start_part = out_key.split('_o_')[0]
-            start_x, start_y = map(int, start_part.split('_'))
-
-            for in_key in in_keys:
-                if in_key not in object_input_nodes:
-                    continue  # Skip if no match
-
-                # Get destination coordinates directly from value
-                end_x, end_y = object_input_nodes[in_key]
-
-                # Calculate change amount
-                x_diff = end_x - start_x
-                y_diff = end_y - start_y
+        wires = WireGraph(object_output_nodes, object_input_nodes)
+        if wires.dangling:
+            print(f"{len(wires.dangling)} wire connection(s) lead to input nodes that were not found:")
+            for line in wires.describe_dangling():
+                print(f"  {line}")
 
-                # Coordinate representation (x, y coordinates are tile units → multiply by 8 for px conversion)
-                polyline_obj = {
-                    "height": 0,
-                    "id": current_id,
-                    "name": "",
-                    "polyline": [
-                        {"x": 0, "y": 0},
-                        {"x": x_diff * 8, "y": y_diff * 8}
-                    ],
-                    "rotation": 0,
-                    "type": "",
-                    "visible": True,
-                    "width": 0,
-                    "x": start_x * 8,
-                    "y": start_y * 8
-                }
+        # Coordinate representation (x, y coordinates are tile units → multiply by 8 for px conversion)
+        positions = (wires.starts * 8).tolist()
+        diffs = ((wires.ends - wires.starts) * 8).tolist()
 
-                polylines.append(polyline_obj)
-                current_id += 1
+        polylines = []
+        for current_id, (start, diff) in enumerate(zip(positions, diffs), starting_id):
+            polylines.append({
+                "height": 0,
+                "id": current_id,
+                "name": "",
+                "polyline": [
+                    {"x": 0, "y": 0},
+                    {"x": diff[0], "y": diff[1]}
+                ],
+                "rotation": 0,
+                "type": "",
+                "visible": True,
+                "width": 0,
+                "x": start[0],
+                "y": start[1]
+            })
 
-        return polylines, current_id
+        return polylines, starting_id + len(polylines)
 
-    def create_tiled_map_json(self, world_name, tileset_paths, fbase64_data, bbase64_data, lbase64_data, width, height, tilesets, monster_entities=None, npc_entities=None, object_entities=None, vehicle_entities=None, object_output_nodes=None, object_input_nodes=None):
+    def create_tiled_map_json(self, world_name, map_save_path, fbase64_data, bbase64_data, lbase64_data, width, height, tilesets, monster_entities=None, npc_entities=None, object_entities=None, vehicle_entities=None, object_output_nodes=None, object_input_nodes=None, fmods_data=None, bmods_data=None, before_layers=None, removed_entities=None):
         # Create .json file path
         filename = os.path.splitext(os.path.basename(world_name))[0] + ".json"
-        json_path = os.path.join(self.map_save_path.get(), filename)
+        json_path = os.path.join(map_save_path, filename)
 
         # Basic layer structure
+        # base64_data is one encoded string (a GID list for CSV), or a list of chunks for infinite maps
         def make_layer(id_, name, opacity, base64_data=None):
+            is_tile_layer = base64_data is not None
             layer = {
                 "id": id_,
                 "name": name,
                 "opacity": opacity,
-                "type": "tilelayer" if base64_data else "objectgroup",
+                "type": "tilelayer" if is_tile_layer else "objectgroup",
                 "visible": True,
                 "x": 0,
                 "y": 0,
-                "draworder": "topdown" if not base64_data else None
+                "draworder": "topdown" if not is_tile_layer else None
             }
-            if base64_data:
+            if is_tile_layer and self.infinite:
+                layer.update(self.layer_format())
+                layer["chunks"] = base64_data
+                layer.update(self.chunk_bounds(base64_data))
+            elif is_tile_layer:
+                layer.update(self.layer_format())
                 layer.update({
-                    "compression": "zlib",
-                    "encoding": "base64",
                     "data": base64_data,
                     "width": width,
                     "height": height
@@ -555,7 +1427,7 @@ class StarboundToTiledUI:
         # Complete map data structure
         map_data = {
             "backgroundcolor": "#000000",
-            "compressionlevel": 0,
+            "compressionlevel": self.map_compression_level(),
             "editorsettings": {
                 "export": {
                     "target": "."
@@ -565,12 +1437,12 @@ class StarboundToTiledUI:
             "width": width,
             "tilewidth": 8,
             "tileheight": 8,
-            "infinite": False,
+            "infinite": self.infinite,
             "layers": [
                 make_layer(1, "back", 0.5, bbase64_data),
                 make_layer(2, "front", 1, lbase64_data),
                 make_layer(3, "front", 1, fbase64_data),
-                make_layer(4, "mods", 1),
+                make_layer(4, "mods", 1, fmods_data),
                 make_layer(5, "objects", 1),
                 make_layer(6, "wiring", 1),
                 make_layer(7, "monsters", 1),
@@ -588,11 +1460,55 @@ class StarboundToTiledUI:
             "tilesets": tilesets
         }
 
-        current_id = 1
+        current_id = self.add_entity_objects(
+            dict(zip(("objects", "wiring", "monsters", "npcs", "vehicles"), map_data["layers"][4:9])), height, 1,
+            monster_entities, npc_entities, object_entities, vehicle_entities, object_output_nodes, object_input_nodes)
+
+        # Background matmods sit right above the background layer
+        if bmods_data is not None:
+            map_data["layers"].insert(1, make_layer(11, "back mods", 0.5, bmods_data))
+            map_data["nextlayerid"] = 12
+
+        # Delta maps (see read_delta_layers): the tiles that were replaced, on hidden layers, and the removed entities
+        if before_layers is not None:
+            # ID 11 belongs to the back mods layer (see MAP_TILE_LAYER_IDS), even in maps without one
+            map_data["nextlayerid"] = max(map_data["nextlayerid"], 12)
+            # Stacked and named like the live tile layers (the liquid layer is called "liquid" here)
+            for name, title, opacity in (("back", "back", 0.5), ("back_mods", "back mods", 0.5), ("liquid", "liquid", 1),
+                                         ("front", "front", 1), ("front_mods", "mods", 1)):
+                if name not in before_layers:
+                    continue
+                layer = make_layer(map_data["nextlayerid"], f"{title} (before)", opacity, before_layers[name])
+                layer["visible"] = False
+                map_data["layers"].append(layer)
+                map_data["nextlayerid"] += 1
+        if removed_entities is not None:
+            removed_layers = {}
+            for kind in ("objects", "wiring", "monsters", "npcs", "vehicles"):
+                removed_layers[kind] = make_layer(map_data["nextlayerid"], f"removed {kind}", 1)
+                map_data["layers"].append(removed_layers[kind])
+                map_data["nextlayerid"] += 1
+            current_id = self.add_entity_objects(
+                removed_layers, height, current_id,
+                removed_entities["monsters"], removed_entities["npcs"], removed_entities["objects"],
+                removed_entities["vehicles"], removed_entities["object_output_nodes"], removed_entities["object_input_nodes"])
+
+        # Update final object ID
+        map_data["nextobjectid"] = current_id
+
+        # Save JSON file
+        with self.profiler.stage("write map JSON"):
+            self.write_json(map_data, json_path)
+
+        print(f"Converted Tiled Map creation completed: {json_path}")
+        return json_path
 
+    def add_entity_objects(self, layers, height, current_id, monster_entities=None, npc_entities=None, object_entities=None, vehicle_entities=None, object_output_nodes=None, object_input_nodes=None):
+        # Fills the "objects", "wiring", "monsters", "npcs" and "vehicles" object layers of a map of the given height,
+        # numbering the objects from current_id; returns the next free object ID
         # Process object_entities
         if object_entities:
-            object_layer = map_data["layers"][4]  # "objects"
+            object_layer = layers["objects"]
             for obj in object_entities:
                 tile_x, tile_y = obj["tilePosition"]
 #                direction = "right" if obj["orientationIndex"] == 1 else "left"
@@ -624,15 +1540,15 @@ class StarboundToTiledUI:
 
                 current_id += 1
 
-        # Process wiring
-        if object_output_nodes and object_input_nodes:
-            result, next_id = self.build_polylines(object_output_nodes, object_input_nodes, current_id)
+        # Process wiring (outputs without any known input are still checked, to report them as dangling)
+        if object_output_nodes:
+            result, next_id = self.build_polylines(object_output_nodes, object_input_nodes or {}, current_id)
             if result:
-                wire_layer = map_data["layers"][5]  # "wires"
+                wire_layer = layers["wiring"]
                 wire_layer["color"] = "#ffff00"
                 wire_layer["objects"] = result
         else:
-            wire_layer = map_data["layers"][5]  # "wires"
+            wire_layer = layers["wiring"]
             wire_layer["color"] = "#ffff00"
             wire_layer["objects"] = []
             next_id = current_id
@@ -641,7 +1557,7 @@ class StarboundToTiledUI:
 
         # Process monster_entities
         if monster_entities:
-            monster_layer = map_data["layers"][6]  # "monsters"
+            monster_layer = layers["monsters"]
             monster_layer["color"] = "#ff0000"
             for monster in monster_entities:
                 x, y = monster.get("position", [0, 0])
@@ -679,7 +1595,7 @@ class StarboundToTiledUI:
 
         # Process npc_entities
         if npc_entities:
-            npc_layer = map_data["layers"][7]  # "npcs"
+            npc_layer = layers["npcs"]
             npc_layer["color"] = "#00ff00"
             for npc in npc_entities:
                 x, y = npc.get("position", [0, 0])
@@ -718,7 +1634,7 @@ class StarboundToTiledUI:
 
         # Process vehicle_entities
         if vehicle_entities:
-            vehicle_layer = map_data["layers"][8]  # "vehicles"
+            vehicle_layer = layers["vehicles"]
             vehicle_layer["color"] = "#8F00FF"
             for vehicle in vehicle_entities:
 #                print('vehicle', vehicle)
@@ -750,257 +1666,1791 @@ class StarboundToTiledUI:
 
                 current_id += 1
 
-        # Update final object ID
-        map_data["nextobjectid"] = current_id
+        return current_id
 
-        # Save JSON file
-        with open(json_path, "w", encoding="utf-8") as f:
-            json.dump(map_data, f, indent=4)
+    def decode_region_tiles(self, raw):
+        # One 32x32 region: 3 header bytes followed by 1024 packed tiles
+        tiles = np.frombuffer(raw, dtype=TILE_DTYPE, count=REGION_SIZE * REGION_SIZE, offset=REGION_HEADER_SIZE)
+        return tiles.reshape(REGION_SIZE, REGION_SIZE)
 
-        print(f"Converted Tiled Map creation completed: {json_path}")
+    def copy_region_tiles(self, tile_map, region_tiles, rx, ry, origin=(0, 0)):
+        # Copies the fields of tile_map's dtype (WORLD_TILE_DTYPE, or TILE_DTYPE for every field)
+        height, width = tile_map.shape
+
+        # Region position relative to tile_map, whose (0, 0) is the world tile at origin
+        start_x = rx * REGION_SIZE - origin[0]
+        start_y = ry * REGION_SIZE - origin[1]
+
+        # Prevent tilemap range overflow (some regions may be cut off at the edges)
+        x0, y0 = max(start_x, 0), max(start_y, 0)
+        x1, y1 = min(start_x + REGION_SIZE, width), min(start_y + REGION_SIZE, height)
+        if x1 <= x0 or y1 <= y0:
+            return
+
+        target = tile_map[y0:y1, x0:x1]
+        for field in tile_map.dtype.names:
+            target[field] = region_tiles[field][y0 - start_y:y1 - start_y, x0 - start_x:x1 - start_x]
+
+    def load_tilesets(self, tileset_paths):
+        return [self.load_tileset(path, os.path.splitext(os.path.basename(path))[0]) for path in tileset_paths]
+
+    def new_entity_lists(self):
+        return {
+            "monsters": [],
+            "npcs": [],
+            "objects": [],
+            "vehicles": [],
+            # Storage space for object input/output points
+            "object_output_nodes": {},
+            "object_input_nodes": {},
+        }
+
+    def merge_entity_lists(self, entity_lists, part):
+        # Merging in region order gives the same result as decoding the regions one after another
+        for key in ("monsters", "npcs", "objects", "vehicles"):
+            entity_lists[key].extend(part[key])
+        entity_lists["object_input_nodes"].update(part["object_input_nodes"])
+        for out_key, in_keys in part["object_output_nodes"].items():
+            entity_lists["object_output_nodes"].setdefault(out_key, []).extend(in_keys)
+
+    def decode_region(self, world, rx, ry, object_nodes, region_cache=None, area=None):
+        # Returns the region's 32x32 tile block and its extracted entities
+        entity_names = self.wanted_entity_names()
+        if region_cache is None:
+            region_tiles = self.decode_region_tiles(world.get(1, rx, ry))  # 32x32 structured tile array
+            # Entities in this region; the entity layer is not read when no entity kind is wanted
+            entities = self.read_entities_blob(self.read_region_blob(world, 2, rx, ry), entity_names) if entity_names else []
+        else:
+            tile_blob = self.read_region_blob(world, 1, rx, ry)
+            entity_blob = self.read_region_blob(world, 2, rx, ry) if entity_names else None
+            cache_key = region_cache.region_key(tile_blob, entity_blob)
+
+            entry = region_cache.get(cache_key)
+            if entry is not None:
+                tile_bytes, entity_lists = entry
+                return np.frombuffer(tile_bytes, dtype=WORLD_TILE_DTYPE).reshape(REGION_SIZE, REGION_SIZE), entity_lists
+
+            region_tiles = self.decode_region_tiles(zlib.decompress(tile_blob))
+            entities = self.read_entities_blob(entity_blob, entity_names)
+
+        entity_lists = self.new_entity_lists()
+        monsters, npcs, objects, vehicles = self.extract_entities(
+            entities, world.height, object_nodes,
+            entity_lists["object_input_nodes"], entity_lists["object_output_nodes"], area)
+        entity_lists["monsters"].extend(monsters)
+        entity_lists["npcs"].extend(npcs)
+        entity_lists["vehicles"].extend(vehicles)
+        entity_lists["objects"].extend(objects)
+
+        if region_cache is not None:
+            tile_block = np.empty((REGION_SIZE, REGION_SIZE), dtype=WORLD_TILE_DTYPE)
+            for field in WORLD_TILE_DTYPE.names:
+                tile_block[field] = region_tiles[field]
+            region_cache.put(cache_key, (tile_block.tobytes(), entity_lists))
+
+        return region_tiles, entity_lists
+
+    def decode_regions(self, world, chunk_list, tile_map, object_nodes, progress=None, origin=(0, 0), region_cache=None, area=None):
+        entity_lists = self.new_entity_lists()
+
+        for i, (rx, ry) in enumerate(chunk_list):
+            # Cancelling stops between regions
+            self.check_cancelled()
+            if progress:
+                progress(i)
+
+            region_tiles, region_entities = self.decode_region(world, rx, ry, object_nodes, region_cache, area)
+            self.copy_region_tiles(tile_map, region_tiles, rx, ry, origin)
+            self.merge_entity_lists(entity_lists, region_entities)
+
+        return entity_lists
+
+    def decode_regions_parallel(self, world_name, chunk_list, tile_map, object_nodes, area=None):
+        # Workers open their own read-only mmap of the world and write tiles straight into shared memory
+        shm = shared_memory.SharedMemory(create=True, size=max(tile_map.nbytes, 1))
+        try:
+            shared_tiles = np.ndarray(tile_map.shape, dtype=tile_map.dtype, buffer=shm.buf)
+            shared_tiles.fill(0)
+
+            # Several batches per worker keep every core busy when some regions are much heavier
+            batch_size = max(1, -(-len(chunk_list) // (self.region_workers * 4)))
+            batches = [chunk_list[i:i + batch_size] for i in range(0, len(chunk_list), batch_size)]
+
+            with ProcessPoolExecutor(
+                    max_workers=min(self.region_workers, len(batches)), initializer=init_region_worker,
+                    initargs=(world_name, shm.name, tile_map.shape, object_nodes, self.entity_types, area)) as pool:
+                futures = [pool.submit(decode_region_batch, batch) for batch in batches]
+                batch_sizes = {future: len(batch) for future, batch in zip(futures, batches)}
+
+                done = 0
+                for future in as_completed(futures):
+                    done += batch_sizes[future]
+                    self.report_status(f"Processing chunks: {done}/{len(chunk_list)}...")
+                    self.report_progress("Decoding regions", done, len(chunk_list))
+                    if self.cancel_event.is_set():
+                        # Batches not started yet are dropped; running ones finish before the pool closes
+                        for pending in futures:
+                            pending.cancel()
+                        self.check_cancelled()
+
+                entity_lists = self.new_entity_lists()
+                for future in futures:
+                    self.merge_entity_lists(entity_lists, future.result())
+
+            tile_map[...] = shared_tiles
+            del shared_tiles
+        finally:
+            shm.close()
+            shm.unlink()
+
+        return entity_lists
+
+    def layer_names(self):
+        return TILE_LAYERS + MOD_TILE_LAYERS if self.mod_layers else TILE_LAYERS
+
+    def tile_map_to_gids(self, tile_map, config, all_tilesets, firstgids, missing_tile_map, mod_layers=None):
+        # GID arrays by layer name (see layer_names); mod_layers overrides self.mod_layers when given
+        if mod_layers is None:
+            mod_layers = self.mod_layers
+        gids = {}
+        for name, prefix in (("front", "foreground"), ("back", "background")):
+            gids[name] = self.material_layer_to_gids(
+                tile_map[f"{prefix}_material"], tile_map[f"{prefix}_variant"],
+                None if mod_layers else tile_map[f"{prefix}_mod"],
+                config['material'], config['mod'], all_tilesets, firstgids, missing_tile_map)
+        gids["liquid"] = self.liquid_layer_to_gids(
+            tile_map["liquid"], tile_map["liquid_infinite"], config['liquid'], all_tilesets, firstgids, missing_tile_map)
+        if mod_layers:
+            for name, prefix in (("front_mods", "foreground"), ("back_mods", "background")):
+                gids[name] = self.mod_layer_to_gids(
+                    tile_map[f"{prefix}_mod"], config['mod'], all_tilesets, firstgids, missing_tile_map)
+        return gids
+
+    def stream_world_layers(self, world, chunk_list, config, all_tilesets, firstgids, missing_tile_map, region_cache=None, area=None, store_layers=None):
+        # Only one band of region rows is held in memory; each band is resolved and compressed right away
+        # (and copied into the layer store memmaps of create_layer_store, when given)
+        area_x0, area_y0, area_x1, area_y1 = area or (0, 0, world.width, world.height)
+        map_width, map_height = area_x1 - area_x0, area_y1 - area_y0
+        band_rows = self.stream_band_rows
+
+        regions_by_row = {}
+        for rx, ry in chunk_list:
+            regions_by_row.setdefault(ry, []).append((rx, ry))
+
+        layer_names = self.layer_names()
+        compressors = {name: self.layer_compressor(map_width * map_height * 4) for name in layer_names}
+        compressed = {name: [] for name in layer_names}
+        chunks = {name: [] for name in layer_names}
+        entity_lists = self.new_entity_lists()
+
+        # Tiled rows run top to bottom (the np.flipud order), so bands go from the top of the map down
+        first_row, last_row = area_y0 // REGION_SIZE, -(-area_y1 // REGION_SIZE)
+        region_rows = last_row - first_row
+        band_top = last_row
+        while band_top > first_row:
+            band_bottom = max(band_top - band_rows, first_row)
+            self.report_status(f"Processing region rows: {last_row - band_bottom}/{region_rows}...")
+            self.report_progress("Decoding regions", last_row - band_top, region_rows)
+
+            # World rows of the band, cut to the map
+            y0 = max(band_bottom * REGION_SIZE, area_y0)
+            y1 = min(band_top * REGION_SIZE, area_y1)
+            band = np.zeros((y1 - y0, map_width), dtype=WORLD_TILE_DTYPE)
+
+            band_chunks = [chunk for ry in range(band_bottom, band_top) for chunk in regions_by_row.get(ry, [])]
+            with self.profiler.stage("region decode", len(band_chunks) * REGION_SIZE * REGION_SIZE):
+                self.merge_entity_lists(entity_lists, self.decode_regions(
+                    world, band_chunks, band, config['wire'], origin=(area_x0, y0), region_cache=region_cache, area=area))
+
+            with self.profiler.stage("resolve GIDs", band.size):
+                band_gids = self.tile_map_to_gids(band, config, all_tilesets, firstgids, missing_tile_map)
+
+            if store_layers is not None:
+                with self.profiler.stage("save layer store", band.size):
+                    for name in layer_names:
+                        store_layers[name][map_height - (y1 - area_y0):map_height - (y0 - area_y0)] = np.flipud(band_gids[name])
+
+            with self.profiler.stage("encode layers", band.size):
+                if self.infinite:
+                    for name in layer_names:
+                        # Bands are whole region rows, so each band yields complete chunks
+                        chunks[name].extend(self.encode_chunks(
+                            np.flipud(band_gids[name]), map_height, y0 - area_y0, (area_x0, area_y0)))
+                else:
+                    # The layers compress concurrently, each through its own compressor
+                    with ThreadPoolExecutor(max_workers=len(layer_names)) as pool:
+                        parts = pool.map(lambda name: compressors[name].compress(np.flipud(band_gids[name]).tobytes()),
+                                         layer_names)
+                        for name, part in zip(layer_names, parts):
+                            compressed[name].append(part)
+
+            band_top = band_bottom
+
+        if self.infinite:
+            return chunks, entity_lists
+
+        layer_data = {}
+        for name in layer_names:
+            compressed[name].append(compressors[name].flush())
+            layer_data[name] = self.layer_data_value(b"".join(compressed[name]))
+        return layer_data, entity_lists
+
+    def encode_layers(self, gids, world_height, origin=(0, 0)):
+        # gids: GID arrays by layer name, as returned by tile_map_to_gids
+        if self.infinite:
+            # encode_chunks already spreads each layer's chunks over threads
+            return {name: self.encode_chunks(np.flipud(layer), world_height, origin=origin) for name, layer in gids.items()}
+        # The compressors release the GIL, so the layers are compressed concurrently
+        with ThreadPoolExecutor(max_workers=len(gids)) as pool:
+            return dict(zip(gids, pool.map(lambda layer: self.encode_map(np.flipud(layer)), gids.values())))
+
+    def export_area(self, world, chunk_list, config):
+        # (x0, y0, x1, y1) world tiles written to the map, or None for the whole world
+        if self.roi is not None:
+            x0, y0, x1, y1 = self.roi
+            area = (max(x0, 0), max(y0, 0), min(x1, world.width), min(y1, world.height))
+            if area[2] <= area[0] or area[3] <= area[1]:
+                raise ValueError(f"Region of interest {x0},{y0},{x1},{y1} is outside the {world.width}x{world.height} world")
+            return area
+        if self.auto_bbox:
+            with self.profiler.stage("find content area", len(chunk_list) * REGION_SIZE * REGION_SIZE):
+                return self.find_content_area(world, chunk_list, config)
+        return None
+
+    def find_content_area(self, world, chunk_list, config):
+        # Bounding box of the tiles with a material or liquid; only the tile layer of each region is decoded
+        material_ids = config['material'].content_ids()
+        liquid_ids = config['liquid'].content_ids()
+
+        bounds = []
+        for rx, ry in chunk_list:
+            self.check_cancelled()
+            tiles = self.decode_region_tiles(world.get(1, rx, ry))
+            content = (np.isin(tiles["foreground_material"], material_ids)
+                       | np.isin(tiles["background_material"], material_ids)
+                       | np.isin(tiles["liquid"], liquid_ids))
+            rows = np.flatnonzero(content.any(axis=1))
+            if len(rows):
+                cols = np.flatnonzero(content.any(axis=0))
+                x, y = rx * REGION_SIZE, ry * REGION_SIZE
+                bounds.append((x + cols[0], y + rows[0], x + cols[-1] + 1, y + rows[-1] + 1))
+
+        if not bounds:
+            print("No tiles with content found; converting the whole world.")
+            return None
+        bounds = np.array(bounds)
+        return (int(bounds[:, 0].min()), int(bounds[:, 1].min()),
+                min(int(bounds[:, 2].max()), world.width), min(int(bounds[:, 3].max()), world.height))
+
+    def regions_in_area(self, chunk_list, area):
+        x0, y0, x1, y1 = area
+        return [(rx, ry) for rx, ry in chunk_list
+                if rx * REGION_SIZE < x1 and (rx + 1) * REGION_SIZE > x0
+                and ry * REGION_SIZE < y1 and (ry + 1) * REGION_SIZE > y0]
+
+    def find_structures(self, front_gids, back_gids):
+        # Structures as {"label", "tiles", "box"} with box (x0, y0, x1, y1) in map tiles (y up, x1/y1 exclusive),
+        # largest first, and the label_components image telling which cells belong to which structure
+        occupied = (front_gids != 0) | (back_gids != 0)
+        labels, count = label_components(occupied, self.structure_gap)
+
+        ys, xs = np.nonzero(occupied)
+        cell_labels = labels[ys, xs]
+        tiles = np.bincount(cell_labels, minlength=count + 1)
+        box_x0 = np.full(count + 1, occupied.shape[1])
+        box_y0 = np.full(count + 1, occupied.shape[0])
+        box_x1 = np.zeros(count + 1, dtype=np.intp)
+        box_y1 = np.zeros(count + 1, dtype=np.intp)
+        np.minimum.at(box_x0, cell_labels, xs)
+        np.minimum.at(box_y0, cell_labels, ys)
+        np.maximum.at(box_x1, cell_labels, xs + 1)
+        np.maximum.at(box_y1, cell_labels, ys + 1)
+
+        structures = [
+            {"label": label, "tiles": int(tiles[label]),
+             "box": (int(box_x0[label]), int(box_y0[label]), int(box_x1[label]), int(box_y1[label]))}
+            for label in range(1, count + 1) if tiles[label] >= self.min_structure_tiles
+        ]
+        structures.sort(key=lambda structure: -structure["tiles"])
+        print(f"Found {len(structures)} structures ({count - len(structures)} smaller than {self.min_structure_tiles} tiles skipped)")
+        return structures, labels
+
+    def structure_layer(self, gids, labels, structure):
+        x0, y0, x1, y1 = structure["box"]
+        layer = gids[y0:y1, x0:x1].copy()
+        # Tiles of other structures reaching into the box are left out
+        box_labels = labels[y0:y1, x0:x1]
+        layer[(box_labels != 0) & (box_labels != structure["label"])] = 0
+        return layer
+
+    def encode_structures(self, structures, labels, gids, origin=(0, 0)):
+        # Structures are cropped and compressed concurrently (the compressors release the GIL)
+        def encode(structure):
+            x0, y0, x1, y1 = structure["box"]
+            layers = {name: self.structure_layer(layer, labels, structure) for name, layer in gids.items()}
+            return self.encode_layers(layers, y1 - y0, (origin[0] + x0, origin[1] + y0))
+
+        with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+            return list(pool.map(encode, structures))
+
+    def structure_entity_lists(self, entity_lists, labels, structure, map_height):
+        # Entities inside the structure's box, except those on another structure's tiles, moved into its map
+        return self.crop_entity_lists(entity_lists, structure["box"], map_height,
+                                      lambda x, y: labels[y, x] in (0, structure["label"]))
+
+    def crop_entity_lists(self, entity_lists, box, map_height, keep=None):
+        # Entities inside box (x0, y0, x1, y1 map tiles, y up) for which keep(x, y) holds, moved into a map of the box.
+        # Objects and wire nodes are kept in Tiled rows (from the top), the other entities in tiles from the bottom.
+        x0, y0, x1, y1 = box
+        top = map_height - y1  # Tiled row of the box's top edge
+
+        def keeps(x, y):
+            return x0 <= x < x1 and y0 <= y < y1 and (keep is None or keep(x, y))
+
+        def keeps_row(x, row):
+            return keeps(x, map_height - row - 1)
+
+        part = self.new_entity_lists()
+        for key in ("monsters", "npcs", "vehicles"):
+            for entity in entity_lists[key]:
+                x, y = entity["position"]
+                if keeps(x, y):
+                    part[key].append(dict(entity, position=[x - x0, y - y0]))
+        for entity in entity_lists["objects"]:
+            x, row = entity["tilePosition"]
+            if keeps_row(x, row):
+                part["objects"].append(dict(entity, tilePosition=[x - x0, row - top]))
+        for (x, row, node), (node_x, node_row) in entity_lists["object_input_nodes"].items():
+            if keeps_row(x, row):
+                part["object_input_nodes"][(x - x0, row - top, node)] = (node_x - x0, node_row - top)
+        for (x, row, node), in_keys in entity_lists["object_output_nodes"].items():
+            if keeps_row(x, row):
+                part["object_output_nodes"][(x - x0, row - top, node)] = [
+                    (in_x - x0, in_row - top, in_node) for in_x, in_row, in_node in in_keys]
+        return part
+
+    def layer_store_path(self, world_name):
+        return os.path.join(self.layer_store_dir, os.path.splitext(os.path.basename(world_name))[0] + LAYER_STORE_EXTENSION)
+
+    def create_layer_store(self, path, layer_names, width, height):
+        # One width x height uint32 .npy memmap per layer, in Tiled row order (top row first) so exports from the
+        # store compress each layer straight from the file. store.json is written last by save_layer_store, so an
+        # interrupted store is never taken for a complete one.
+        os.makedirs(path, exist_ok=True)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(os.path.join(path, "store.json"))
+        return {
+            name: np.lib.format.open_memmap(os.path.join(path, f"{name}.npy"), mode="w+", dtype=np.uint32, shape=(height, width))
+            for name in layer_names
+        }
 
-    def convert_tile_array_to_material_input(self, tile_arr, material_id_to_name, mod_id_to_name):
-        height, width = tile_arr.shape
-        result = []
-
-        # Add set to prevent duplicates
-        unknown_material_ids = set()
-        unknown_mod_ids = set()
-
-        for y in range(height):
-            row = []
-            for x in range(width):
-                material_id, variant, mod_id = tile_arr[y, x]
-
-                # Handle negative values using bit mask
-                material_id &= 0xFFFF  # Same as subtracting from 65536 (uint16)
-                mod_id &= 0xFFFF       # Same as subtracting from 65536 (uint16)
-                variant &= 0xFF        # Same as subtracting from 256 (uint8)
-
-                material_name = material_id_to_name.get(str(material_id), "")
-                mod_name = mod_id_to_name.get(str(mod_id), "")
-
-                if material_name == "empty":
-                    material_name = ""
-                elif material_name == "":
-                    if material_id not in unknown_material_ids:
-                        print(f"Failed to convert material ID '{material_id}' to material name.")
-                        unknown_material_ids.add(material_id)
-
-                if mod_name == "empty":
-                    mod_name = None
-                elif mod_name == "":
-                    if mod_id not in unknown_mod_ids:
-                        print(f"Failed to convert material mod ID '{mod_id}' to material mod name.")
-                        unknown_mod_ids.add(mod_id)
-
-                row.append([material_name, variant, mod_name])
-            result.append(row)
+    def save_layer_store(self, path, store_layers, world_name, origin, all_tilesets, entity_lists, missing_tile_map):
+        # Entity and wire node tables and the generated tile keys are pickled like the region cache entries
+        for layer in store_layers.values():
+            layer.flush()
+        with open(os.path.join(path, "tables.pickle"), "wb") as f:
+            pickle.dump({"entities": entity_lists, "missing_tiles": missing_tile_map}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        height, width = next(iter(store_layers.values())).shape
+        info = {
+            "version": LAYER_STORE_VERSION,
+            "world": world_name,
+            "origin": list(origin),
+            "width": width,
+            "height": height,
+            "layers": list(store_layers),
+            "tilesets": [[tileset["name"], tileset["tilecount"]] for tileset in all_tilesets],
+            "sharedTileset": self.shared_tileset_path,
+            "entityTypes": list(self.entity_types),
+        }
+        with open(os.path.join(path, "store.json"), "w", encoding="utf-8") as f:
+            json.dump(info, f, indent=4, ensure_ascii=False)
+        print(f"Layer store saved: {path}")
+
+    def load_layer_store(self, path, all_tilesets, missing_tile_map):
+        # Returns (world name, GID layers, entity lists, origin) of a store written by save_layer_store, cropped to
+        # the export area. The layers are read-only memmaps in world row order (flipped views of the files).
+        with open(os.path.join(path, "store.json"), "r", encoding="utf-8") as f:
+            info = json.load(f)
+        if info.get("version") != LAYER_STORE_VERSION:
+            raise ValueError(f"{path} was saved by another version of the converter; convert the world again")
+        if info["tilesets"] != [[tileset["name"], tileset["tilecount"]] for tileset in all_tilesets]:
+            raise ValueError(f"{path} was resolved against other tilesets; convert the world again")
+
+        gids = {name: np.flipud(np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")) for name in info["layers"]}
+        with open(os.path.join(path, "tables.pickle"), "rb") as f:
+            tables = pickle.load(f)
+        entity_lists = tables["entities"]
+        missing_tile_map.update(tables["missing_tiles"])
+
+        # The GIDs keep the generated tile numbering they were resolved with
+        self.shared_tileset_path = info["sharedTileset"]
+        if self.shared_tileset_path is not None:
+            shared = self.add_shared_tiles(self.shared_tileset_path, list(missing_tile_map))
+            if any(shared[key] != local_id for key, local_id in missing_tile_map.items()):
+                raise ValueError(f"The tiles of {self.shared_tileset_path} were renumbered since {path} was saved; "
+                                 "convert the world again")
+
+        # Entity kinds not wanted now are dropped (kinds the store was saved without cannot be added back)
+        for kind in ("monsters", "npcs", "objects", "vehicles"):
+            if kind not in self.entity_types:
+                entity_lists[kind] = []
+        if "wiring" not in self.entity_types:
+            entity_lists["object_output_nodes"], entity_lists["object_input_nodes"] = {}, {}
+
+        origin = tuple(info["origin"])
+        area = self.layer_store_area(gids, origin)
+        if area is not None:
+            print(f"Exporting tiles {area[0]},{area[1]} to {area[2]},{area[3]}")
+            box = (area[0] - origin[0], area[1] - origin[1], area[2] - origin[0], area[3] - origin[1])
+            entity_lists = self.crop_entity_lists(entity_lists, box, info["height"])
+            gids = {name: layer[box[1]:box[3], box[0]:box[2]] for name, layer in gids.items()}
+            origin = area[:2]
+        return info["world"], gids, entity_lists, origin
+
+    def layer_store_area(self, gids, origin):
+        # Like export_area, for the tiles of a layer store: (x0, y0, x1, y1) world tiles, or None for all of them
+        height, width = gids["front"].shape
+        x0, y0, x1, y1 = origin[0], origin[1], origin[0] + width, origin[1] + height
+        if self.roi is not None:
+            area = (max(self.roi[0], x0), max(self.roi[1], y0), min(self.roi[2], x1), min(self.roi[3], y1))
+            if area[2] <= area[0] or area[3] <= area[1]:
+                raise ValueError(f"Region of interest {','.join(map(str, self.roi))} is outside the stored tiles "
+                                 f"{x0},{y0} to {x1},{y1}")
+            return area
+        if self.auto_bbox:
+            # Tiles with a material or liquid have a non-zero GID
+            content = np.zeros((height, width), dtype=bool)
+            for name in TILE_LAYERS:
+                content |= gids[name] != 0
+            rows = np.flatnonzero(content.any(axis=1))
+            if not len(rows):
+                print("No tiles with content found; converting the whole store.")
+                return None
+            cols = np.flatnonzero(content.any(axis=0))
+            return (x0 + int(cols[0]), y0 + int(rows[0]), x0 + int(cols[-1]) + 1, y0 + int(rows[-1]) + 1)
+        return None
+
+    def convert_world(self, config, world_name, tileset_paths, tileset_save_path, map_save_path, all_tilesets=None):
+        self.profiler = StageProfiler(self.python_profile, self.trace_allocations)
+        with self.profiler.capture():
+            result = self.run_world_conversion(config, world_name, tileset_paths, tileset_save_path, map_save_path, all_tilesets)
+
+        print(self.profiler.summary())
+        if self.profile_report or self.python_profile or self.trace_allocations:
+            result["profile_path"] = self.write_profile_report(world_name, result)
         return result
 
-    def convert_tile_array_to_liquid_input(self, tile_arr, liquid_id_to_name):
-        height, width = tile_arr.shape
-        result = []
+    def write_profile_report(self, world_name, result):
+        # <map>.profile.json next to the map (plus <map>.prof, loadable with pstats, when cProfile ran)
+        base_path = os.path.splitext(result["map_path"])[0]
+        report = {
+            "world": world_name,
+            "map": result["map_path"],
+            "options": self.worker_options(),
+            "missingTiles": len(result["missing_tile_map"]),
+            "tileKeyCache": {"hits": self.key_cache.hits, "misses": self.key_cache.misses},
+        }
+        report.update(self.profiler.report())
+        if self.profiler.python_profile:
+            self.profiler.python_profile.dump_stats(base_path + ".prof")
+            report["pythonProfileFile"] = base_path + ".prof"
+
+        report_path = base_path + ".profile.json"
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+        print(f"Profiling report written: {report_path}")
+        return report_path
+
+    def run_world_conversion(self, config, world_name, tileset_paths, tileset_save_path, map_save_path, all_tilesets=None):
+        # Tileset list as (path, name) pairs
+        tileset_paths = [(path, os.path.splitext(os.path.basename(path))[0]) for path in tileset_paths]
+
+        self.start_stage("Loading tilesets")
+
+        # Callers converting several worlds pass the already loaded tilesets
+        if all_tilesets is None:
+            with self.profiler.stage("load tilesets"):
+                all_tilesets = self.load_tilesets([path for path, name in tileset_paths])
+        firstgids = self.tileset_firstgids(all_tilesets)
+        self.key_cache.use_tilesets(all_tilesets)
+
+        # Initialize missing tile map
+        missing_tile_map = {}
+        self.shared_tileset_path = os.path.join(tileset_save_path, SHARED_TILESET_NAME) if self.shared_tileset else None
+
+        self.start_stage("Reading world file")
+
+        store_path = None
+        before_gids = before_layer_data = removed_entities = None
+        if self.delta_from:
+            gids, before_gids, entity_lists, removed_entities, origin, map_width, map_height = self.read_delta_layers(
+                config, world_name, all_tilesets, firstgids, missing_tile_map)
+            layer_data = None
+            # <world>_delta.json, with a generated tileset of the same name
+            stem, extension = os.path.splitext(world_name)
+            world_name = f"{stem}_delta{extension}"
+        elif is_layer_store(world_name):
+            # Tiles resolved by an earlier conversion: the world file is not read at all
+            with self.profiler.stage("read layer store"):
+                world_name, gids, entity_lists, origin = self.load_layer_store(world_name, all_tilesets, missing_tile_map)
+            map_height, map_width = gids["front"].shape
+            layer_data = None
+        else:
+            if self.layer_store_dir:
+                store_path = self.layer_store_path(world_name)
+            gids, layer_data, entity_lists, origin, map_width, map_height = self.read_world_layers(
+                config, world_name, all_tilesets, firstgids, missing_tile_map, store_path)
+        world_cells = map_width * map_height
+
+        structures = []
+        if layer_data is None:
+            self.start_stage("Encoding map data")
+
+            if self.split_structures:
+                with self.profiler.stage("find structures", world_cells):
+                    structures, structure_labels = self.find_structures(gids["front"], gids["back"])
+
+            # Compression + base64 encoding
+            with self.profiler.stage("encode layers", world_cells):
+                if structures:
+                    layer_data = self.encode_structures(structures, structure_labels, gids, origin)
+                else:
+                    layer_data = self.encode_layers(gids, map_height, origin)
+                before_layer_data = None if before_gids is None else self.encode_layers(before_gids, map_height, origin)
+
+        self.start_stage("Generating missing tileset")
 
-        # Add set to prevent duplicates
-        unknown_liquid_ids = set()
+        with self.profiler.stage("generated tileset"):
+            if self.shared_tileset_path is not None:
+                # Missing tiles were appended while resolving; a world without any still needs the file to exist
+                generated_path = self.shared_tileset_path
+                generated_count = len(self.add_shared_tiles(generated_path, []))
+                print(f"Generated Tileset shared: {generated_path}")
+            else:
+                generated_tileset = self.generate_missing_tileset_from_map(missing_tile_map, "generated_tiles")
 
-        for y in range(height):
-            row = []
-            for x in range(width):
-                liquid_id, infinite = tile_arr[y, x]
+                # generated_tiles folder path
+                filename = os.path.splitext(os.path.basename(world_name))[0] + ".json"
+                generated_path = os.path.join(tileset_save_path, filename)
 
-                # Handle negative values using bit mask
-                liquid_id &= 0xFF  # Same as subtracting from 256 (uint16)
+                self.write_json(generated_tileset, generated_path, ensure_ascii=False)
+                generated_count = generated_tileset["tilecount"]
 
-                liquid_name = liquid_id_to_name.get(str(liquid_id), "")
+                print(f"Generated Tileset creation completed: {generated_path}")
+            tileset_paths.append((generated_path, "generated_tiles"))
+
+            # Regenerate tilesets
+            tilesets = self.generate_tilesets(tileset_paths, relative_to=os.path.dirname(world_name),
+                                              tilecounts={generated_path: generated_count})
+
+        self.start_stage("Creating Tiled map JSON")
+
+        def write_map(map_name, layers, width, height, entities, before_layers=None, removed_entities=None):
+            return self.create_tiled_map_json(
+                map_name, map_save_path,
+                layers["front"], layers["back"], layers["liquid"],
+                width, height,
+                tilesets,
+                entities["monsters"], entities["npcs"], entities["objects"], entities["vehicles"],
+                entities["object_output_nodes"], entities["object_input_nodes"],
+                layers.get("front_mods"), layers.get("back_mods"),
+                before_layers, removed_entities
+            )
+
+        with self.profiler.stage("map JSON", world_cells):
+            if structures:
+                # <world>_structure1.json (the largest), <world>_structure2.json, ...; all share the generated tileset
+                stem, extension = os.path.splitext(world_name)
+                json_paths = []
+                for index, (structure, layers) in enumerate(zip(structures, layer_data), 1):
+                    x0, y0, x1, y1 = structure["box"]
+                    json_paths.append(write_map(
+                        f"{stem}_structure{index}{extension}", layers, x1 - x0, y1 - y0,
+                        self.structure_entity_lists(entity_lists, structure_labels, structure, map_height)))
+                json_path = json_paths[0]
+            else:
+                json_path = write_map(world_name, layer_data, map_width, map_height, entity_lists,
+                                      before_layer_data, removed_entities)
+                json_paths = [json_path]
 
-                if liquid_name == "empty":
-                    liquid_name = ""
-                elif liquid_name == "":
-                    if liquid_id not in unknown_liquid_ids:
-                        print(f"Failed to convert liquid ID '{liquid_id}' to liquid name.")
-                        unknown_liquid_ids.add(liquid_id)
+        print(self.key_cache.report())
 
-                row.append([liquid_name, infinite])
-            result.append(row)
-        return result
+        return {
+            "map_path": json_path,
+            "map_paths": json_paths,
+            "generated_tileset_path": generated_path,
+            "missing_tile_map": missing_tile_map,
+            "layer_store_path": store_path,
+        }
 
-    def convert_world_to_tiled(self):
-        try:
-            # Load tiledConfig.json
-            self.status_label.config(text="Loading configuration...", fg="orange")
-            self.root.update()
-            
-            with open(self.config_path.get(), encoding="utf-8") as f:
-                tiledConfig = json.load(f)['worldToTiled']
-                material_id_to_name = tiledConfig['material']
-                mod_id_to_name = tiledConfig['mod']
-                liquid_id_to_name = tiledConfig['liquid']
-                object_nodes = tiledConfig['wire']
-
-            # World file to convert
-            world_name = self.world_path.get()
-            
-            # Tileset list (using paths selected in UI)
-            tileset_paths = [(path, os.path.splitext(os.path.basename(path))[0]) for path in self.tileset_paths]
-
-            self.status_label.config(text="Reading world file...", fg="orange")
-            self.root.update()
-
-            with open(world_name, 'rb') as fh:
-                mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    def read_world_layers(self, config, world_name, all_tilesets, firstgids, missing_tile_map, store_path=None):
+        # Decodes the world (or its export area) and resolves its tiles, saving them to a layer store at store_path
+        object_nodes = config['wire']
 
+        with open(world_name, 'rb') as fh:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+            with self.profiler.stage("read world"):
                 world = starbound.World(mm)
                 world.read_metadata()
 
-                # Initialize world tile array (width x height)
                 world_width, world_height = world.width, world.height
 
-                tile_map = np.empty((world_height, world_width), dtype=object)
-
-                foreground = np.empty((world_height, world_width), dtype=object)
-                liquid = np.empty((world_height, world_width), dtype=object)
-                background = np.empty((world_height, world_width), dtype=object)
-
                 # Extract chunk (region) coordinates
                 chunk_list = list(world.get_all_regions_with_tiles())  # Convert generator to list
 
-                # entity_list: list to accumulate results
-                monster_list = []
-                object_list = []
-                npc_list = []
-                vehicle_list = []
-
-                # Storage space for object input/output points
-                object_output_nodes = {}
-                object_input_nodes = {}
-
-                total_chunks = len(chunk_list)
-                for i, (rx, ry) in enumerate(chunk_list):
-                    if i % 10 == 0:  # Update status every 10 chunks
-                        self.status_label.config(text=f"Processing chunks: {i}/{total_chunks}...", fg="orange")
-                        self.root.update()
-                    
-                    tiles = world.get_tiles(rx, ry)  # This is a 32x32 Tile list
-                    entities = self.safe_get_entities(world, rx, ry)  # Entities in this region
-
-                    # Calculate world position coordinates
-                    start_x = rx * 32
-                    start_y = ry * 32
-
-                    # Prevent tilemap range overflow (some regions may be cut off at the end)
-                    for local_y in range(32):
-                        for local_x in range(32):
-                            wx, wy = start_x + local_x, start_y + local_y
-                            if wx < world_width and wy < world_height:
-                                idx = local_y * 32 + local_x  # flat list index
-                                tile_map[wy, wx] = tiles[idx]
-
-                    # Extract and accumulate entities
-                    monsters, npcs, objects, vehicles = self.extract_entities(entities, world_height, object_nodes, object_input_nodes, object_output_nodes)
-                    monster_list.extend(monsters)
-                    npc_list.extend(npcs)
-                    vehicle_list.extend(vehicles)
-                    object_list.extend(objects)
-
-                self.status_label.config(text="Processing tile data...", fg="orange")
-                self.root.update()
-                
-                for y in range(world_height):
-                    for x in range(world_width):
-                        tile = tile_map[y, x]
-                        if tile is not None:
-                            foreground[y, x] = [tile.foreground_material, tile.foreground_variant, tile.foreground_mod]
-                            liquid[y, x] = [tile.liquid, tile.liquid_infinite]
-                            background[y, x] = [tile.background_material, tile.background_variant, tile.background_mod]
-                        else:
-                            # Default values when tile is None (e.g., [0, 0, 0])
-                            foreground[y, x] = [0, 0, 0]
-                            liquid[y, x] = [0, 0]
-                            background[y, x] = [0, 0, 0]
-
-                self.status_label.config(text="Converting tile arrays...", fg="orange")
-                self.root.update()
-                
-                foreground_material_input = self.convert_tile_array_to_material_input(foreground, material_id_to_name, mod_id_to_name)
-                background_material_input = self.convert_tile_array_to_material_input(background, material_id_to_name, mod_id_to_name)
-                liquid_input = self.convert_tile_array_to_liquid_input(liquid, liquid_id_to_name)
-
-                self.status_label.config(text="Generating tilesets...", fg="orange")
-                self.root.update()
-                
-                tilesets = self.generate_tilesets(tileset_paths)
-                all_tilesets = [self.load_tileset(path, name) for path, name in tileset_paths]
-
-                height = len(foreground_material_input)
-                width = len(foreground_material_input[0]) if height > 0 else 0
-
-                # Initialize missing tile map
-                missing_tile_map = {}
-
-                # Call conversion methods
-                self.status_label.config(text="Processing material names...", fg="orange")
-                self.root.update()
-                
-                front_result = self.material_names_to_tuples_with_color_variant(foreground_material_input, all_tilesets, missing_tile_map)
-                back_result = self.material_names_to_tuples_with_color_variant(background_material_input, all_tilesets, missing_tile_map)
-                liquid_result = self.liquid_names_to_tuples(liquid_input, all_tilesets, missing_tile_map)
-
-                self.status_label.config(text="Generating missing tileset...", fg="orange")
-                self.root.update()
-                
-                generated_tileset = self.generate_missing_tileset_from_map(missing_tile_map, "generated_tiles")
+            # A region of interest crops the map: only the regions overlapping it are read
+            area = self.export_area(world, chunk_list, config)
+            if area is not None:
+                chunk_list = self.regions_in_area(chunk_list, area)
+                print(f"Exporting tiles {area[0]},{area[1]} to {area[2]},{area[3]} ({len(chunk_list)} regions)")
+                map_width, map_height = area[2] - area[0], area[3] - area[1]
+            else:
+                map_width, map_height = world_width, world_height
+            origin = (0, 0) if area is None else (area[0], area[1])
+            world_cells = map_width * map_height
+
+            # The parallel decoder reads regions in worker processes and does not use the cache
+            region_cache = None
+            if self.region_cache_dir and not (self.region_workers > 1 and self.stream_band_rows <= 0):
+                region_cache = self.open_region_cache(world_name, world, object_nodes, area)
+
+            store_layers = None
+            if store_path is not None:
+                store_layers = self.create_layer_store(store_path, self.layer_names(), map_width, map_height)
+
+            self.start_stage("Decoding regions")
+            if self.stream_band_rows > 0:
+                layer_data, entity_lists = self.stream_world_layers(
+                    world, chunk_list, config, all_tilesets, firstgids, missing_tile_map, region_cache, area, store_layers)
+                gids = None
+            else:
+                # Regions without tile data stay zero (empty material / liquid)
+                tile_map = np.zeros((map_height, map_width), dtype=WORLD_TILE_DTYPE)
+
+                # Extract and accumulate entities and object input/output points
+                with self.profiler.stage("region decode", len(chunk_list) * REGION_SIZE * REGION_SIZE):
+                    if self.region_workers > 1 and len(chunk_list) > 1:
+                        entity_lists = self.decode_regions_parallel(world_name, chunk_list, tile_map, object_nodes, area)
+                    else:
+                        total_chunks = len(chunk_list)
+
+                        def progress(i):
+                            if i % 10 == 0:  # Update status every 10 chunks
+                                self.report_status(f"Processing chunks: {i}/{total_chunks}...")
+                                self.report_progress("Decoding regions", i, total_chunks)
+
+                        entity_lists = self.decode_regions(
+                            world, chunk_list, tile_map, object_nodes, progress, origin, region_cache, area)
+
+                self.start_stage("Resolving tile GIDs")
+
+                with self.profiler.stage("resolve GIDs", world_cells):
+                    gids = self.tile_map_to_gids(tile_map, config, all_tilesets, firstgids, missing_tile_map)
+                del tile_map
+                layer_data = None
+
+                if store_layers is not None:
+                    with self.profiler.stage("save layer store", world_cells):
+                        for name, layer in gids.items():
+                            store_layers[name][...] = np.flipud(layer)
+
+        if region_cache is not None:
+            with self.profiler.stage("save region cache"):
+                region_cache.save()
+            print(region_cache.report())
+
+        if store_layers is not None:
+            self.save_layer_store(store_path, store_layers, world_name, origin, all_tilesets, entity_lists, missing_tile_map)
+
+        # GID arrays by layer name, or with stream_band_rows the already encoded layers (gids is then None)
+        return gids, layer_data, entity_lists, origin, map_width, map_height
+
+    def changed_regions(self, before, after):
+        # Regions whose tile or entity blob differs between two worlds, or that only one of them has. Equal
+        # compressed blobs hold equal regions, so unchanged regions are recognized without decoding them.
+        regions = set()
+        for key in set(before.get_all_keys()) | set(after.get_all_keys()):
+            layer, rx, ry = struct.unpack('>BHH', key)
+            if layer in (1, 2) and (rx, ry) not in regions \
+               and self.read_region_blob(before, layer, rx, ry) != self.read_region_blob(after, layer, rx, ry):
+                regions.add((rx, ry))
+        return sorted(regions)
+
+    def entity_list_delta(self, before, after):
+        # (added, removed) entity lists: the entities of after that before does not have and the other way round
+        # (equal entities pair up one to one), and likewise for wire connections. Each keeps its world's input nodes,
+        # so the wires still resolve.
+        def entity_key(entity):
+            return json.dumps(entity, sort_keys=True, default=str)
+
+        added, removed = self.new_entity_lists(), self.new_entity_lists()
+        for target, side, other in ((added, after, before), (removed, before, after)):
+            for kind in ("monsters", "npcs", "objects", "vehicles"):
+                unmatched = Counter(map(entity_key, other[kind]))
+                for entity in side[kind]:
+                    key = entity_key(entity)
+                    if unmatched[key]:
+                        unmatched[key] -= 1
+                    else:
+                        target[kind].append(entity)
+
+            target["object_input_nodes"] = side["object_input_nodes"]
+            for out_key, in_keys in side["object_output_nodes"].items():
+                other_keys = set(other["object_output_nodes"].get(out_key, ()))
+                new_keys = [in_key for in_key in in_keys if in_key not in other_keys]
+                if new_keys:
+                    target["object_output_nodes"][out_key] = new_keys
+        return added, removed
+
+    def read_delta_layers(self, config, world_name, all_tilesets, firstgids, missing_tile_map):
+        # Compares world_name with the earlier self.delta_from. Only the regions whose blobs differ are decoded (in
+        # both worlds) and resolved; a tile counts as changed when its GID in a layer differs. Returns the GIDs after
+        # and before the change (0 for unchanged tiles), the added and removed entities, the origin and the map size.
+        object_nodes = config['wire']
+        worlds = []
+        with open(self.delta_from, 'rb') as before_fh, open(world_name, 'rb') as after_fh:
+            with self.profiler.stage("read world"):
+                for fh in (before_fh, after_fh):
+                    world = starbound.World(mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ))
+                    world.read_metadata()
+                    worlds.append(world)
+            before, after = worlds
+            if (before.width, before.height) != (after.width, after.height):
+                raise ValueError(f"{self.delta_from} ({before.width}x{before.height}) and {world_name} "
+                                 f"({after.width}x{after.height}) are not copies of the same world")
+
+            with self.profiler.stage("compare regions"):
+                chunk_list = self.changed_regions(before, after)
+            print(f"{len(chunk_list)} regions changed since {self.delta_from}")
+
+            # A region of interest crops the map; with auto_bbox it is cropped to the changed tiles further down
+            area = None if self.auto_bbox else self.export_area(after, chunk_list, config)
+            if area is not None:
+                chunk_list = self.regions_in_area(chunk_list, area)
+                map_width, map_height = area[2] - area[0], area[3] - area[1]
+            else:
+                map_width, map_height = after.width, after.height
+            origin = (0, 0) if area is None else (area[0], area[1])
+
+            self.start_stage("Decoding regions")
+            gids, entity_lists = [], []
+            for world in worlds:
+                present = set(world.get_all_regions_with_tiles())
+                tile_map = np.zeros((map_height, map_width), dtype=WORLD_TILE_DTYPE)
+                with self.profiler.stage("region decode", len(chunk_list) * REGION_SIZE * REGION_SIZE):
+                    entity_lists.append(self.decode_regions(
+                        world, [chunk for chunk in chunk_list if chunk in present], tile_map, object_nodes,
+                        origin=origin, area=area))
+                with self.profiler.stage("resolve GIDs", tile_map.size):
+                    gids.append(self.tile_map_to_gids(tile_map, config, all_tilesets, firstgids, missing_tile_map))
+                del tile_map
+        before_gids, after_gids = gids
+
+        self.start_stage("Resolving tile GIDs")
+        with self.profiler.stage("diff tiles", map_width * map_height):
+            changed = np.zeros((map_height, map_width), dtype=bool)
+            for name in after_gids:
+                unchanged = before_gids[name] == after_gids[name]
+                before_gids[name][unchanged] = 0
+                after_gids[name][unchanged] = 0
+                changed |= ~unchanged
+        added, removed = self.entity_list_delta(*entity_lists)
+        entity_kinds = ("monsters", "npcs", "objects", "vehicles")
+        print(f"{np.count_nonzero(changed)} tiles changed, {sum(len(added[kind]) for kind in entity_kinds)} entities added, "
+              f"{sum(len(removed[kind]) for kind in entity_kinds)} removed")
+
+        if self.auto_bbox:
+            # Corners of the changed tiles and positions of the added and removed entities, in map tiles (y up)
+            points = []
+            rows = np.flatnonzero(changed.any(axis=1))
+            if len(rows):
+                cols = np.flatnonzero(changed.any(axis=0))
+                points += [(int(cols[0]), int(rows[0])), (int(cols[-1]), int(rows[-1]))]
+            for part in (added, removed):
+                for key in ("monsters", "npcs", "vehicles"):
+                    points += [(int(x), int(y)) for x, y in (entity["position"] for entity in part[key])]
+                points += [(x, map_height - row - 1) for x, row in (entity["tilePosition"] for entity in part["objects"])]
+                points += [(x, map_height - row - 1) for x, row, node in part["object_output_nodes"]]
+            if not points:
+                print("Nothing changed; converting the whole world.")
+            else:
+                xs, ys = zip(*points)
+                box = (max(min(xs), 0), max(min(ys), 0), min(max(xs) + 1, map_width), min(max(ys) + 1, map_height))
+                print(f"Exporting tiles {box[0]},{box[1]} to {box[2]},{box[3]}")
+                added = self.crop_entity_lists(added, box, map_height)
+                removed = self.crop_entity_lists(removed, box, map_height)
+                before_gids = {name: layer[box[1]:box[3], box[0]:box[2]] for name, layer in before_gids.items()}
+                after_gids = {name: layer[box[1]:box[3], box[0]:box[2]] for name, layer in after_gids.items()}
+                origin, map_width, map_height = box[:2], box[2] - box[0], box[3] - box[1]
+
+        return after_gids, before_gids, added, removed, origin, map_width, map_height
+
+    def try_convert_world(self, config, world_name, tileset_paths, tileset_save_path, map_save_path, all_tilesets=None):
+        # Batch variant of convert_world: failures are returned instead of raised
+        try:
+            result = self.convert_world(config, world_name, tileset_paths, tileset_save_path, map_save_path, all_tilesets)
+        except ConversionCancelled:
+            raise
+        except Exception as e:
+            print(f"Error: conversion of {world_name} failed: {e}")
+            return {"world": world_name, "ok": False, "error": str(e), "missing_tiles": []}
+        return {
+            "world": world_name,
+            "ok": True,
+            "map_path": result["map_path"],
+            "missing_tiles": list(result["missing_tile_map"]),
+        }
 
-                # generated_tiles folder path
-                filename = os.path.splitext(os.path.basename(world_name))[0] + ".json"
-                generated_path = os.path.join(self.tileset_save_path.get(), filename)
+    def convert_batch(self, config, world_paths, tileset_paths, tileset_save_path, map_save_path, workers=1, all_tilesets=None):
+        if all_tilesets is None:
+            all_tilesets = self.load_tilesets(tileset_paths)
+
+        workers = max(1, min(workers, len(world_paths)))
+        if workers == 1:
+            results = []
+            for i, world_path in enumerate(world_paths):
+                self.report_status(f"Converting world {i + 1}/{len(world_paths)}: {world_path}")
+                results.append(self.try_convert_world(config, world_path, tileset_paths, tileset_save_path, map_save_path, all_tilesets))
+            return results
+
+        # Config tables and parsed tilesets are sent to each worker once, not once per world
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_batch_worker,
+                                 initargs=(config, all_tilesets, self.worker_options())) as pool:
+            futures = [pool.submit(convert_batch_world, world_path, tileset_paths, tileset_save_path, map_save_path)
+                       for world_path in world_paths]
+            results = []
+            for i, future in enumerate(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    # The worker process itself died (e.g. out of memory)
+                    results.append({"world": world_paths[i], "ok": False, "error": str(e), "missing_tiles": []})
+                self.report_status(f"Converted {i + 1}/{len(world_paths)} worlds...")
+        return results
+
+    def aggregate_missing_tiles(self, results):
+        # Missing tile key -> worlds in which it was missing
+        missing = {}
+        for result in results:
+            for key in result["missing_tiles"]:
+                missing.setdefault(key, []).append(result["world"])
+        return missing
+
+    def read_map_layers(self, map_data):
+        # GID arrays of a map's tile layers by layer name (see MAP_TILE_LAYER_IDS), in world row order (y up)
+        width, height = map_data["width"], map_data["height"]
+        layers = {}
+        for layer in map_data["layers"]:
+            name = MAP_TILE_LAYER_IDS.get(layer.get("id"))
+            if name is None or layer.get("type") != "tilelayer":
+                continue
+            compression = layer.get("compression", "")
+            if "chunks" in layer:
+                grid = np.zeros((height, width), dtype=np.uint32)
+                for chunk in layer["chunks"]:
+                    block = self.layer_gids(chunk["data"], compression, chunk["width"], chunk["height"])
+                    # Chunks of cropped maps reach past the map's edges
+                    x0, y0 = max(chunk["x"], 0), max(chunk["y"], 0)
+                    x1, y1 = min(chunk["x"] + chunk["width"], width), min(chunk["y"] + chunk["height"], height)
+                    if x1 > x0 and y1 > y0:
+                        grid[y0:y1, x0:x1] = block[y0 - chunk["y"]:y1 - chunk["y"], x0 - chunk["x"]:x1 - chunk["x"]]
+            else:
+                grid = self.layer_gids(layer["data"], compression, layer["width"], layer["height"])
+            layers[name] = np.flipud(grid)
+        return layers
+
+    def map_tilesets(self, map_data, map_path, tileset_paths):
+        # (all_tilesets, firstgids) of the tilesets a map uses, named by their firstgid. External tilesets are taken
+        # from tileset_paths by file name first (generate_tilesets writes sources relative to the world's folder),
+        # then looked up next to the map.
+        by_file_name = {os.path.basename(path): path for path in tileset_paths}
+        all_tilesets, firstgids = [], {}
+        for tileset in map_data.get("tilesets", []):
+            source = tileset.get("source")
+            if source is None:
+                # Embedded in the map
+                index = self.compile_tileset(json.dumps(tileset).encode("utf-8"), map_path)
+            else:
+                path = by_file_name.get(os.path.basename(source), os.path.join(os.path.dirname(map_path), source))
+                if not os.path.exists(path):
+                    raise ValueError(f"Tileset {source} of {map_path} not found; pass it with --tilesets")
+                index = self.tileset_index(path)
+            name = str(tileset["firstgid"])
+            all_tilesets.append({"name": name, "tilecount": index["tilecount"], "material_map": index["material_map"]})
+            firstgids[name] = tileset["firstgid"]
+        # Tiles of the base world missing from every tileset get GIDs past the map's
+        firstgids["generated_tiles"] = max([firstgids[t["name"]] + t["tilecount"] for t in all_tilesets], default=1)
+        return all_tilesets, firstgids
+
+    def reverse_tile_tables(self, all_tilesets, firstgids, config):
+        # Per-GID arrays inverting the tilesets: material/variant/material_mod for the material layers, liquid/source
+        # for the liquid layer and mod for the matmod layers. -1 marks GIDs that are not a tile of that kind; the
+        # last entry stands for every GID past the tilesets.
+        size = firstgids["generated_tiles"]
+        material_ids = config['material'].name_ids()
+        mod_ids = config['mod'].name_ids()
+        liquid_ids = config['liquid'].name_ids()
+        no_mod = mod_ids.get("empty", NO_MOD_ID)
+
+        tables = {
+            "material": np.full(size + 1, -1, dtype=np.int64),
+            "variant": np.zeros(size + 1, dtype=np.uint8),
+            "material_mod": np.full(size + 1, no_mod, dtype=np.int64),
+            "liquid": np.full(size + 1, -1, dtype=np.int64),
+            "source": np.zeros(size + 1, dtype=bool),
+            "mod": np.full(size + 1, -1, dtype=np.int64),
+        }
+        # GID 0 is an empty tile in every layer
+        tables["material"][0] = material_ids.get("empty", EMPTY_MATERIAL_ID)
+        tables["liquid"][0] = liquid_ids.get("empty", 0)
+        tables["mod"][0] = no_mod
+
+        unknown_names = set()
+        for tileset in all_tilesets:
+            firstgid = firstgids[tileset["name"]]
+            for key, local_id in tileset["material_map"].items():
+                gid = firstgid + int(local_id)
+                if gid >= size:
+                    continue
+                if len(key) == 3:
+                    material, color_variant, mod = key
+                    if material not in material_ids or (mod is not None and mod not in mod_ids):
+                        unknown_names.add(material if material not in material_ids else mod)
+                        continue
+                    tables["material"][gid] = material_ids[material]
+                    tables["variant"][gid] = color_variant or 0
+                    tables["material_mod"][gid] = no_mod if mod is None else mod_ids[mod]
+                elif len(key) == 2:
+                    liquid, source = key
+                    if liquid not in liquid_ids:
+                        unknown_names.add(liquid)
+                        continue
+                    tables["liquid"][gid] = liquid_ids[liquid]
+                    tables["source"][gid] = source
+                elif key[0] in mod_ids:
+                    tables["mod"][gid] = mod_ids[key[0]]
+                else:
+                    unknown_names.add(key[0])
+
+        if unknown_names:
+            print(f"{len(unknown_names)} tile names are not in the worldToTiled config, so their tiles are left unchanged: "
+                  + ", ".join(sorted(unknown_names)[:10]) + (" ..." if len(unknown_names) > 10 else ""))
+        return tables
+
+    def fill_empty_tiles(self, tiles, config):
+        # Tiles of regions a world does not have yet: no material, mod or liquid
+        empty_material = config['material'].name_ids().get("empty", EMPTY_MATERIAL_ID)
+        no_mod = config['mod'].name_ids().get("empty", NO_MOD_ID)
+        for prefix in ("foreground", "background"):
+            tiles[f"{prefix}_material"] = empty_material
+            tiles[f"{prefix}_mod"] = no_mod
+        tiles["liquid"] = config['liquid'].name_ids().get("empty", 0)
+
+    def apply_map_tiles(self, tiles, map_gids, base_gids, tables, mod_layers):
+        # Writes the map's tiles over tiles (TILE_DTYPE, world row order) where their GID differs from the tile's
+        # own GID (base_gids); other fields (hue shifts, collision, biome, ...) are kept. Returns the changed cells.
+        changed = np.zeros(tiles.shape, dtype=bool)
+        last_gid = len(tables["material"]) - 1
+        skipped = 0
+
+        def edits(name, table):
+            # Cells to rewrite and their GIDs; GIDs of another kind of tile (or of no tile) are skipped
+            nonlocal changed, skipped
+            gids = np.minimum(map_gids[name], last_gid)
+            cells = map_gids[name] != base_gids[name]
+            known = table[gids] >= 0
+            skipped += int(np.count_nonzero(cells & ~known))
+            cells &= known
+            changed |= cells
+            return cells, gids[cells]
+
+        for name, prefix in (("front", "foreground"), ("back", "background")):
+            if name in map_gids:
+                cells, gids = edits(name, tables["material"])
+                tiles[f"{prefix}_material"][cells] = tables["material"][gids]
+                tiles[f"{prefix}_variant"][cells] = tables["variant"][gids]
+                if not mod_layers:
+                    tiles[f"{prefix}_mod"][cells] = tables["material_mod"][gids]
+        if "liquid" in map_gids:
+            cells, gids = edits("liquid", tables["liquid"])
+            liquid = tables["liquid"][gids]
+            tiles["liquid"][cells] = liquid
+            tiles["liquid_infinite"][cells] = tables["source"][gids]
+            # Painted liquid fills its tile; erased liquid leaves none
+            level = (liquid != tables["liquid"][0]).astype(np.float32)
+            tiles["liquid_level"][cells] = level
+            tiles["liquid_pressure"][cells] = level
+        if mod_layers:
+            for name, prefix in (("front_mods", "foreground"), ("back_mods", "background")):
+                if name in map_gids:
+                    cells, gids = edits(name, tables["mod"])
+                    tiles[f"{prefix}_mod"][cells] = tables["mod"][gids]
+
+        if skipped:
+            print(f"{skipped} tiles use GIDs that are not a tile of their layer's kind and were left unchanged")
+        return changed
+
+    def convert_map_to_world(self, config, map_path, tileset_paths, world_save_path, base_world=None, origin=(0, 0)):
+        self.profiler = StageProfiler(self.python_profile, self.trace_allocations)
+        with self.profiler.capture():
+            world_path = self.run_map_to_world(config, map_path, tileset_paths, world_save_path, base_world, origin)
+        print(self.profiler.summary())
+        return world_path
+
+    def run_map_to_world(self, config, map_path, tileset_paths, world_save_path, base_world=None, origin=(0, 0)):
+        # Writes the tiles of a map made by create_tiled_map_json over base_world, with the map's bottom-left tile
+        # at the world tile origin, and saves the result as <map>.world (or the base world's extension) in
+        # world_save_path. Everything else in the base world (metadata, entities, other regions) is copied as is.
+        # Without a base world, a new world of the map's size is written with empty metadata.
+        self.shared_tileset_path = None
+
+        with self.profiler.stage("read map"):
+            with open(map_path, "rb") as f:
+                map_data = json.loads(f.read().decode("utf-8"))
+            map_gids = self.read_map_layers(map_data)
+            all_tilesets, firstgids = self.map_tilesets(map_data, map_path, tileset_paths)
+        width, height = map_data["width"], map_data["height"]
+        mod_layers = "front_mods" in map_gids or "back_mods" in map_gids
+        self.key_cache.use_tilesets(all_tilesets)
+
+        with self.profiler.stage("reverse tables"):
+            tables = self.reverse_tile_tables(all_tilesets, firstgids, config)
+
+        x0, y0 = origin
+        if base_world is None:
+            world_width, world_height = x0 + width, y0 + height
+            items = {world_key(0, 0, 0): pack_world_metadata(world_width, world_height, {})}
+        else:
+            with self.profiler.stage("read world"):
+                with open(base_world, 'rb') as fh:
+                    mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+                world = starbound.World(mm)
+                world.read_metadata()
+                world_width, world_height = world.width, world.height
+                # Every BTree value, still compressed
+                items = {key: starbound.BTreeDB5.get(world, key) for key in world.get_all_keys()}
+                mm.close()
+        if x0 < 0 or y0 < 0 or x0 + width > world_width or y0 + height > world_height:
+            raise ValueError(f"A {width}x{height} map at {x0},{y0} does not fit into the {world_width}x{world_height} world")
+
+        # Whole regions overlapping the map, so every region written out is complete
+        rx0, ry0 = x0 // REGION_SIZE, y0 // REGION_SIZE
+        rx1, ry1 = -(-(x0 + width) // REGION_SIZE), -(-(y0 + height) // REGION_SIZE)
+        region_tiles = np.zeros(((ry1 - ry0) * REGION_SIZE, (rx1 - rx0) * REGION_SIZE), dtype=TILE_DTYPE)
+        self.fill_empty_tiles(region_tiles, config)
+        headers = {}
+        with self.profiler.stage("region decode", region_tiles.size):
+            for ry in range(ry0, ry1):
+                for rx in range(rx0, rx1):
+                    blob = items.get(world_key(1, rx, ry))
+                    if blob is not None:
+                        raw = zlib.decompress(blob)
+                        headers[(rx, ry)] = raw[:REGION_HEADER_SIZE]
+                        self.copy_region_tiles(region_tiles, self.decode_region_tiles(raw), rx, ry,
+                                               (rx0 * REGION_SIZE, ry0 * REGION_SIZE))
+
+        map_area = (slice(y0 - ry0 * REGION_SIZE, y0 - ry0 * REGION_SIZE + height),
+                    slice(x0 - rx0 * REGION_SIZE, x0 - rx0 * REGION_SIZE + width))
+        tiles = region_tiles[map_area]
+
+        # The map's GIDs are compared with those of the tiles they replace, so unchanged tiles keep every field
+        with self.profiler.stage("resolve GIDs", tiles.size):
+            base_gids = self.tile_map_to_gids(tiles, config, all_tilesets, firstgids, {}, mod_layers)
+        with self.profiler.stage("apply map tiles", tiles.size):
+            changed = np.zeros(region_tiles.shape, dtype=bool)
+            changed[map_area] = self.apply_map_tiles(tiles, map_gids, base_gids, tables, mod_layers)
+
+        with self.profiler.stage("pack regions", region_tiles.size):
+            rows, cols = ry1 - ry0, rx1 - rx0
+            blocks = region_tiles.reshape(rows, REGION_SIZE, cols, REGION_SIZE).swapaxes(1, 2)
+            block_changed = changed.reshape(rows, REGION_SIZE, cols, REGION_SIZE).any(axis=(1, 3))
+            # A new world gets every region; a base world only the regions with changed tiles
+            positions = np.argwhere(block_changed | (base_world is None)).tolist()
+            level = -1 if self.compression_level is None else self.compression_level
+
+            def pack(position):
+                i, j = position
+                header = headers.get((rx0 + j, ry0 + i), b"\0" * REGION_HEADER_SIZE)
+                return world_key(1, rx0 + j, ry0 + i), pack_region_tiles(blocks[i, j], header, level)
+
+            # zlib releases the GIL, so regions compress in parallel on threads
+            with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+                items.update(pool.map(pack, positions))
+
+        extension = WORLD_EXTENSIONS[0] if base_world is None else os.path.splitext(base_world)[1]
+        world_path = os.path.join(world_save_path, os.path.splitext(os.path.basename(map_path))[0] + extension)
+        with self.profiler.stage("write world"):
+            # Through a temp file, so the base world itself can be the output
+            temp_path = f"{world_path}.{os.getpid()}.tmp"
+            write_btree_file(temp_path, "World4", items)
+            os.replace(temp_path, world_path)
+
+        print(f"World written: {world_path} ({len(positions)} regions rewritten)")
+        return world_path
+
+# Per-process state of batch workers, filled once by init_batch_worker
+_batch_worker = {}
+
+def init_batch_worker(config, all_tilesets, options):
+    _batch_worker["converter"] = WorldToTiledConverter(**options)
+    _batch_worker["config"] = config
+    _batch_worker["all_tilesets"] = all_tilesets
+
+def convert_batch_world(world_path, tileset_paths, tileset_save_path, map_save_path):
+    converter = _batch_worker["converter"]
+    return converter.try_convert_world(
+        _batch_worker["config"], world_path, tileset_paths, tileset_save_path, map_save_path,
+        _batch_worker["all_tilesets"])
+
+def is_layer_store(path):
+    # Folder written by WorldToTiledConverter.save_layer_store
+    return os.path.isfile(os.path.join(path, "store.json"))
+
+def find_world_files(paths):
+    # Directories (e.g. universe/) are searched recursively for world files; layer stores are taken as they are
+    world_paths = []
+    for path in paths:
+        if not os.path.isdir(path) or is_layer_store(path):
+            world_paths.append(path)
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.lower().endswith(WORLD_EXTENSIONS):
+                    world_paths.append(os.path.join(dirpath, filename))
+    return world_paths
+
+# Per-process state of region decoding workers, filled once by init_region_worker
+_region_worker = {}
+
+def init_region_worker(world_name, shm_name, shape, object_nodes, entity_types=ENTITY_TYPES, area=None):
+    fh = open(world_name, 'rb')
+    mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    # Workers share the parent's resource tracker, which forgets the segment when the parent unlinks it
+    shm = shared_memory.SharedMemory(name=shm_name)
+
+    _region_worker["converter"] = WorldToTiledConverter(entity_types=entity_types)
+    _region_worker["world"] = starbound.World(mm)
+    _region_worker["world"].read_metadata()
+    _region_worker["files"] = (fh, mm, shm)
+    _region_worker["tile_map"] = np.ndarray(shape, dtype=WORLD_TILE_DTYPE, buffer=shm.buf)
+    _region_worker["object_nodes"] = object_nodes
+    _region_worker["area"] = area
+
+def decode_region_batch(chunk_batch):
+    area = _region_worker["area"]
+    return _region_worker["converter"].decode_regions(
+        _region_worker["world"], chunk_batch, _region_worker["tile_map"], _region_worker["object_nodes"],
+        origin=(0, 0) if area is None else area[:2], area=area)
+
+def skip_sbon_dynamic(stream):
+    # Moves past one SBON value without building it (same layout as sbon.read_dynamic)
+    type_id = ord(stream.read(1))
+    if type_id == 2:
+        stream.seek(8, io.SEEK_CUR)
+    elif type_id == 3:
+        stream.seek(1, io.SEEK_CUR)
+    elif type_id == 4:
+        sbon.read_varint(stream)
+    elif type_id == 5:
+        stream.seek(sbon.read_varint(stream), io.SEEK_CUR)
+    elif type_id == 6:
+        for _ in range(sbon.read_varint(stream)):
+            skip_sbon_dynamic(stream)
+    elif type_id == 7:
+        for _ in range(sbon.read_varint(stream)):
+            stream.seek(sbon.read_varint(stream), io.SEEK_CUR)  # Key string
+            skip_sbon_dynamic(stream)
+    elif type_id != 1:
+        raise ValueError('Unknown dynamic type 0x%02X' % type_id)
+
+def world_key(layer, rx, ry):
+    # World BTree keys: layer (0 metadata, 1 tiles, 2 entities) followed by the region coordinates
+    return struct.pack('>BHH', layer, rx, ry)
+
+def pack_world_metadata(width, height, metadata, version=1):
+    stream = io.BytesIO()
+    stream.write(struct.pack('>ii', width, height))
+    starbound.write_versioned_json(stream, starbound.VersionedJSON("WorldMetadata", version, metadata))
+    return zlib.compress(stream.getvalue())
+
+def pack_region_tiles(region_tiles, header=b"\0" * REGION_HEADER_SIZE, level=-1):
+    # region_tiles: 32x32 array of TILE_DTYPE, the inverse of decode_region_tiles
+    return zlib.compress(header + np.ascontiguousarray(region_tiles, dtype=TILE_DTYPE).tobytes(), level)
+
+def pack_region_entities(entities):
+    # entities: list of starbound.VersionedJSON
+    stream = io.BytesIO()
+    sbon.write_varint(stream, len(entities))
+    for entity in entities:
+        starbound.write_versioned_json(stream, entity)
+    return zlib.compress(stream.getvalue())
+
+def write_btree_file(path, name, items, block_size=2048, keys_per_leaf=32):
+    """Writes items ({key: value} of equal-length byte keys) as a BTreeDB5 file.
+
+    Leaves hold up to keys_per_leaf keys and continue into further blocks when
+    their values do not fit; index levels are added until a single root remains.
+    The result reads back with starbound.BTreeDB5.
+    """
+    items = sorted(items.items())
+    if not items:
+        raise ValueError("A BTreeDB5 file needs at least one key")
+    key_size = len(items[0][0])
+    blocks = []
+
+    def add_leaf(leaf_items):
+        stream = io.BytesIO()
+        stream.write(struct.pack('>i', len(leaf_items)))
+        for key, value in leaf_items:
+            stream.write(key)
+            sbon.write_varint(stream, len(value))
+            stream.write(value)
+        payload = stream.getvalue()
+
+        # Each block: "LL", payload part, pointer to the block holding the rest (-1 for none)
+        capacity = block_size - 6
+        parts = [payload[i:i + capacity] for i in range(0, len(payload), capacity)]
+        first_block = len(blocks)
+        for i, part in enumerate(parts):
+            next_block = first_block + i + 1 if i + 1 < len(parts) else -1
+            blocks.append(b"LL" + part.ljust(capacity, b"\0") + struct.pack('>i', next_block))
+        return first_block
+
+    level = [(leaf_items[0][0], add_leaf(leaf_items))
+             for leaf_items in (items[i:i + keys_per_leaf] for i in range(0, len(items), keys_per_leaf))]
+
+    depth = 0
+    children_per_index = (block_size - 11) // (key_size + 4)
+    while len(level) > 1:
+        next_level = []
+        for i in range(0, len(level), children_per_index):
+            children = level[i:i + children_per_index]
+            block = b"II" + struct.pack('>Bii', depth, len(children) - 1, children[0][1])
+            for key, child in children[1:]:
+                block += key + struct.pack('>i', child)
+            blocks.append(block.ljust(block_size, b"\0"))
+            next_level.append((children[0][0], len(blocks) - 1))
+        level = next_level
+        depth += 1
+
+    root_block, root_is_leaf = level[0][1], depth == 0
+    header = struct.pack(btreedb5.HEADER, b"BTreeDB5", block_size, name.encode("utf-8"), key_size,
+                         False, -1, -1, root_block, root_is_leaf, -1, -1, root_block, root_is_leaf)
+    with open(path, "wb") as f:
+        f.write(header)
+        for block in blocks:
+            f.write(block)
 
-                with open(generated_path, "w", encoding="utf-8") as f:
-                    json.dump(generated_tileset, f, indent=4, ensure_ascii=False)
+class StarboundToTiledUI:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Starbound → Tiled Converter")
+        self.root.geometry("600x490")
 
-                print(f"Generated Tileset creation completed: {generated_path}")
-                tileset_paths.append((generated_path, "generated_tiles"))
-
-                # Regenerate tilesets
-                tilesets = self.generate_tilesets(tileset_paths, relative_to=os.path.dirname(world_name))
-
-                self.status_label.config(text="Encoding map data...", fg="orange")
-                self.root.update()
-                
-                front_result_flipped = np.flipud(front_result)
-                back_result_flipped = np.flipud(back_result)
-                liquid_result_flipped = np.flipud(liquid_result)
-
-                # Compression + base64 encoding
-                front_base64_data = self.encode_map(front_result_flipped, tilesets)
-                back_base64_data = self.encode_map(back_result_flipped, tilesets)
-                liquid_base64_data = self.encode_map(liquid_result_flipped, tilesets)
-
-                self.status_label.config(text="Creating Tiled map JSON...", fg="orange")
-                self.root.update()
-                
-                self.create_tiled_map_json(
-                    world_name, tileset_paths,
-                    front_base64_data, back_base64_data, liquid_base64_data,
-                    world_width, world_height,
-                    tilesets,
-                    monster_list, npc_list, object_list, vehicle_list,
-                    object_output_nodes, object_input_nodes
-                )
-
-                self.status_label.config(text="Conversion completed successfully!", fg="green")
-                self.root.update()
-                
-                messagebox.showinfo("Completed", "Conversion has been completed.")
-                
+        # Path variables
+        self.config_path = tk.StringVar()
+        self.world_path = tk.StringVar()
+        self.tileset_paths = []
+        self.tileset_save_path = tk.StringVar()
+        self.map_save_path = tk.StringVar()
+
+        # Profiling options
+        self.profile_report = tk.BooleanVar()
+        self.profile_detailed = tk.BooleanVar()
+        self.compact_json = tk.BooleanVar()
+        self.compression = tk.StringVar(value="zlib")
+        self.mod_layers = tk.BooleanVar()
+        self.shared_tileset = tk.BooleanVar()
+        self.entity_types = {kind: tk.BooleanVar(value=True) for kind in ENTITY_TYPES}
+        self.roi = tk.StringVar()
+        self.auto_bbox = tk.BooleanVar()
+        self.split_structures = tk.BooleanVar()
+
+        # The conversion runs in a worker thread; it only posts events here, which poll_events
+        # handles on the Tk thread (Tk must not be touched from other threads)
+        self.events = queue.Queue()
+        self.worker = None
+        self.started_at = None
+        self.stage_offsets = {}
+        offset = 0.0
+        for stage, share in CONVERSION_STAGES:
+            self.stage_offsets[stage] = (offset, share)
+            offset += share
+        self.total_share = offset
+
+        # Shared by every conversion run from this window
+        self.converter = WorldToTiledConverter(
+            status_callback=lambda text: self.events.put(("status", text)),
+            progress_callback=lambda stage, done, total: self.events.put(("progress", stage, done, total)),
+            index_cache_dir=default_index_cache_dir())
+
+        self.create_widgets()
+
+    def create_widgets(self):
+        row = 0
+
+        # starbound.config
+        tk.Label(self.root, text="starbound.config path:").grid(row=row, column=0, sticky="w")
+        tk.Entry(self.root, textvariable=self.config_path, width=50).grid(row=row, column=1)
+        tk.Button(self.root, text="Browse", command=self.select_config).grid(row=row, column=2)
+        row += 1
+
+        # .world file
+        tk.Label(self.root, text=".world file path:").grid(row=row, column=0, sticky="w")
+        tk.Entry(self.root, textvariable=self.world_path, width=50).grid(row=row, column=1)
+        tk.Button(self.root, text="Browse", command=self.select_world).grid(row=row, column=2)
+        row += 1
+
+        # Multiple tilesets to load
+        tk.Label(self.root, text="Tileset files to load:").grid(row=row, column=0, sticky="w")
+        tk.Button(self.root, text="Add Tilesets", command=self.add_tilesets).grid(row=row, column=1, sticky="w")
+        row += 1
+
+        # Tileset list table
+        self.tileset_table = ttk.Treeview(self.root, columns=("path",), show="headings", height=5)
+        self.tileset_table.heading("path", text="Tileset Path")
+        self.tileset_table.grid(row=row, column=0, columnspan=3, sticky="nsew")
+        row += 1
+
+        # Output tileset folder (single folder)
+        tk.Label(self.root, text="Output tileset folder:").grid(row=row, column=0, sticky="w")
+        tk.Entry(self.root, textvariable=self.tileset_save_path, width=50).grid(row=row, column=1)
+        tk.Button(self.root, text="Browse", command=self.select_tileset_save).grid(row=row, column=2)
+        row += 1
+
+        tk.Checkbutton(self.root, text="Share one generated tileset between worlds",
+                       variable=self.shared_tileset).grid(row=row, column=1, sticky="w")
+        row += 1
+
+        # Output Tiled map folder
+        tk.Label(self.root, text="Output Tiled map folder:").grid(row=row, column=0, sticky="w")
+        tk.Entry(self.root, textvariable=self.map_save_path, width=50).grid(row=row, column=1)
+        tk.Button(self.root, text="Browse", command=self.select_map_save).grid(row=row, column=2)
+        row += 1
+
+        # Output format
+        tk.Checkbutton(self.root, text="Compact JSON (smaller files, faster to write)",
+                       variable=self.compact_json).grid(row=row, column=0, columnspan=2, sticky="w")
+        tk.Checkbutton(self.root, text="Matmod layers", variable=self.mod_layers).grid(row=row, column=2, sticky="w")
+        row += 1
+
+        # Tile layer compression
+        tk.Label(self.root, text="Layer compression:").grid(row=row, column=0, sticky="w")
+        compressions = [name for name in LAYER_COMPRESSIONS if name != "zstd" or zstandard is not None]
+        ttk.Combobox(self.root, textvariable=self.compression, values=compressions, state="readonly",
+                     width=10).grid(row=row, column=1, sticky="w")
+        row += 1
+
+        # Entity kinds written to the map
+        tk.Label(self.root, text="Entities:").grid(row=row, column=0, sticky="w")
+        entity_frame = tk.Frame(self.root)
+        entity_frame.grid(row=row, column=1, columnspan=2, sticky="w")
+        for kind in ENTITY_TYPES:
+            tk.Checkbutton(entity_frame, text=kind.capitalize(), variable=self.entity_types[kind]).pack(side=tk.LEFT)
+        row += 1
+
+        # Part of the world to export
+        tk.Label(self.root, text="Export area (x0,y0,x1,y1):").grid(row=row, column=0, sticky="w")
+        area_frame = tk.Frame(self.root)
+        area_frame.grid(row=row, column=1, columnspan=2, sticky="w")
+        tk.Entry(area_frame, textvariable=self.roi, width=24).pack(side=tk.LEFT)
+        tk.Checkbutton(area_frame, text="Crop to content", variable=self.auto_bbox).pack(side=tk.LEFT)
+        tk.Checkbutton(area_frame, text="One map per structure", variable=self.split_structures).pack(side=tk.LEFT)
+        row += 1
+
+        # Profiling
+        tk.Checkbutton(self.root, text="Write profiling report", variable=self.profile_report).grid(row=row, column=0, sticky="w")
+        tk.Checkbutton(self.root, text="Include cProfile and allocation tracing (slower)",
+                       variable=self.profile_detailed).grid(row=row, column=1, sticky="w")
+        row += 1
+
+        # Progress bar
+        tk.Label(self.root, text="Progress:").grid(row=row, column=0, sticky="w")
+        self.progress_bar = ttk.Progressbar(self.root, mode='determinate', maximum=100)
+        self.progress_bar.grid(row=row, column=1, sticky="ew", padx=(0, 10))
+        self.eta_label = tk.Label(self.root, text="")
+        self.eta_label.grid(row=row, column=2, sticky="w")
+        row += 1
+
+        # Status label
+        self.status_label = tk.Label(self.root, text="Ready", fg="blue")
+        self.status_label.grid(row=row, column=0, columnspan=3, sticky="w")
+        row += 1
+
+        # Run / Cancel buttons
+        buttons = tk.Frame(self.root)
+        buttons.grid(row=row, column=0, columnspan=3, pady=10)
+        self.run_button = tk.Button(buttons, text="Run Conversion", command=self.run_conversion, bg="#4CAF50", fg="white")
+        self.run_button.pack(side=tk.LEFT, padx=5)
+        self.cancel_button = tk.Button(buttons, text="Cancel", command=self.cancel_conversion, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+
+    def select_config(self):
+        path = filedialog.askopenfilename(title="Select starbound.config", filetypes=[("Starbound Config File", "*.config")])
+        if path:
+            self.config_path.set(path)
+
+    def select_world(self):
+        path = filedialog.askopenfilename(title="Select .world file", filetypes=[("Starbound World File", "*.world;*.shipworld")])
+        if path:
+            self.world_path.set(path)
+
+    def add_tilesets(self):
+        paths = filedialog.askopenfilenames(title="Select tilesets", filetypes=[("Starbound Tilesets File", "*.json")])
+        for p in paths:
+            if p not in self.tileset_paths:
+                self.tileset_paths.append(p)
+                self.tileset_table.insert("", tk.END, values=(p,))
+
+    def select_tileset_save(self):
+        path = filedialog.askdirectory(title="Select output generated tileset folder")
+        if path:
+            self.tileset_save_path.set(path)
+
+    def select_map_save(self):
+        path = filedialog.askdirectory(title="Select output Tiled dungeon map folder")
+        if path:
+            self.map_save_path.set(path)
+
+    def run_conversion(self):
+        if not self.config_path.get() or not self.world_path.get() or not self.tileset_paths \
+           or not self.tileset_save_path.get() or not self.map_save_path.get():
+            messagebox.showerror("Error", "Please fill in all paths.")
+            return
+        try:
+            roi = parse_roi(self.roi.get()) if self.roi.get().strip() else None
+        except argparse.ArgumentTypeError as e:
+            messagebox.showerror("Error", f"Export area: {e}")
+            return
+
+        detailed = self.profile_detailed.get()
+        self.converter.profile_report = self.profile_report.get() or detailed
+        self.converter.python_profile = detailed
+        self.converter.trace_allocations = detailed
+        self.converter.json_format = "compact" if self.compact_json.get() else "pretty"
+        self.converter.compression = self.compression.get()
+        self.converter.mod_layers = self.mod_layers.get()
+        self.converter.shared_tileset = self.shared_tileset.get()
+        self.converter.entity_types = tuple(kind for kind in ENTITY_TYPES if self.entity_types[kind].get())
+        # An export area takes precedence over cropping to content
+        self.converter.roi = roi
+        self.converter.auto_bbox = roi is None and self.auto_bbox.get()
+        self.converter.split_structures = self.split_structures.get()
+        self.converter.cancel_event.clear()
+
+        # Tk variables are read here, on the Tk thread
+        paths = (self.config_path.get(), self.world_path.get(), list(self.tileset_paths),
+                 self.tileset_save_path.get(), self.map_save_path.get())
+
+        self.run_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+        self.progress_bar.config(value=0)
+        self.eta_label.config(text="")
+        self.set_status("Starting conversion...")
+        self.started_at = time.monotonic()
+
+        self.worker = threading.Thread(target=self.convert_world_to_tiled, args=paths, daemon=True)
+        self.worker.start()
+        self.root.after(100, self.poll_events)
+
+    def cancel_conversion(self):
+        # The worker stops at the next region or stage boundary
+        self.converter.cancel_event.set()
+        self.cancel_button.config(state=tk.DISABLED)
+        self.set_status("Cancelling...")
+
+    def set_status(self, text, color="orange"):
+        self.status_label.config(text=text, fg=color)
+
+    def show_progress(self, stage, done, total):
+        offset, share = self.stage_offsets.get(stage, (0.0, 0.0))
+        fraction = (offset + (share * done / total if total else 0.0)) / self.total_share
+        self.progress_bar.config(value=100 * fraction)
+
+        # Estimated from the elapsed time and the weighted stage progress, once there is something to go on
+        elapsed = time.monotonic() - self.started_at
+        if fraction >= 0.02 and elapsed >= 1:
+            remaining = int(elapsed * (1 - fraction) / fraction)
+            self.eta_label.config(text=f"ETA {remaining // 60}:{remaining % 60:02d}")
+
+    def poll_events(self):
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+
+            kind = event[0]
+            if kind == "status":
+                if not self.converter.cancel_event.is_set():
+                    self.set_status(event[1])
+            elif kind == "progress":
+                self.show_progress(*event[1:])
+            else:
+                self.finish_conversion(*event)
+                return
+
+        self.root.after(100, self.poll_events)
+
+    def finish_conversion(self, kind, message=None, result=None):
+        self.worker = None
+        self.run_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
+        self.eta_label.config(text="")
+
+        if kind == "done":
+            self.progress_bar.config(value=100)
+            self.set_status(f"Conversion completed successfully in {self.converter.profiler.total_seconds:.1f}s!", "green")
+            message = "Conversion has been completed.\n\n" + self.converter.profiler.summary()
+            if "profile_path" in result:
+                message += f"\n\nProfiling report: {result['profile_path']}"
+            messagebox.showinfo("Completed", message)
+        elif kind == "cancelled":
+            self.progress_bar.config(value=0)
+            self.set_status("Conversion cancelled.", "blue")
+        else:
+            self.set_status("Conversion failed!", "red")
+            messagebox.showerror("Error", f"Conversion failed: {message}")
+
+    def convert_world_to_tiled(self, config_path, world_path, tileset_paths, tileset_save_path, map_save_path):
+        # Runs in the worker thread; the outcome is posted as the last event
+        try:
+            self.events.put(("status", "Loading configuration..."))
+            config = self.converter.load_config(config_path)
+
+            result = self.converter.convert_world(config, world_path, tileset_paths, tileset_save_path, map_save_path)
+            self.events.put(("done", None, result))
+
+        except ConversionCancelled:
+            print("Conversion cancelled.")
+            self.events.put(("cancelled",))
         except Exception as e:
-            self.status_label.config(text="Conversion failed!", fg="red")
-            self.root.update()
-            messagebox.showerror("Error", f"Conversion failed: {str(e)}")
             print(f"Error: {e}")
-
-if __name__ == "__main__":
+            self.events.put(("error", str(e)))
+
+def parse_roi(text):
+    # "x0,y0,x1,y1" in world tiles (x1/y1 exclusive), as given to --roi or typed in the window
+    try:
+        x0, y0, x1, y1 = (int(value) for value in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected x0,y0,x1,y1 tile coordinates, got {text!r}")
+    if x1 <= x0 or y1 <= y0:
+        raise argparse.ArgumentTypeError(f"empty region of interest {text!r} (x1 and y1 are exclusive)")
+    return x0, y0, x1, y1
+
+def parse_entity_kinds(text):
+    # "objects,wiring" as given to --entities or --exclude-entities; "none" (or nothing) is no kind at all
+    kinds = [kind.strip() for kind in text.split(",") if kind.strip()]
+    if kinds == ["none"]:
+        return []
+    unknown = [kind for kind in kinds if kind not in ENTITY_TYPES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown entity kind {unknown[0]!r} (choose from {', '.join(ENTITY_TYPES)})")
+    return kinds
+
+def parse_origin(text):
+    # "x,y" world tile of a map's bottom-left tile, as given to --origin
+    try:
+        x, y = (int(value) for value in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected x,y tile coordinates, got {text!r}")
+    return x, y
+
+def run_to_world_cli(args):
+    converter = WorldToTiledConverter(
+        profile_report=args.profile, python_profile=args.profile_python, trace_allocations=args.trace_allocations,
+        compression_level=args.compression_level, index_cache_dir=None if args.no_index_cache else args.index_cache)
+    config = converter.load_config(args.config)
+    os.makedirs(args.world_output, exist_ok=True)
+
+    failures = 0
+    for map_path in args.worlds:
+        try:
+            converter.convert_map_to_world(config, map_path, args.tilesets, args.world_output, args.base_world, args.origin)
+        except Exception as e:
+            print(f"Failed: {map_path}: {e}")
+            failures += 1
+
+    print(f"Converted {len(args.worlds) - failures}/{len(args.worlds)} maps.")
+    return 1 if failures else 0
+
+def run_cli(args):
+    region_workers = args.region_workers or os.cpu_count() or 1
+    converter = WorldToTiledConverter(
+        region_workers=region_workers, stream_band_rows=args.stream_bands, region_cache_dir=args.region_cache,
+        infinite=args.infinite, profile_report=args.profile, python_profile=args.profile_python,
+        trace_allocations=args.trace_allocations, json_format=args.json_format, json_backend=args.json_backend,
+        compression=args.compression, compression_level=args.compression_level,
+        index_cache_dir=None if args.no_index_cache else args.index_cache,
+        entity_types=[kind for kind in args.entities if kind not in args.exclude_entities],
+        roi=args.roi, auto_bbox=args.auto_bbox, split_structures=args.split_structures,
+        structure_gap=args.structure_gap, min_structure_tiles=args.min_structure_tiles, mod_layers=args.mod_layers,
+        shared_tileset=args.shared_tileset, layer_store_dir=args.save_layers, delta_from=args.delta_from)
+    config = converter.load_config(args.config)
+    all_tilesets = converter.load_tilesets(args.tilesets)
+
+    os.makedirs(args.tileset_output, exist_ok=True)
+    os.makedirs(args.map_output, exist_ok=True)
+
+    world_paths = find_world_files(args.worlds)
+    if not world_paths:
+        print("No .world or .shipworld files found.")
+        return 1
+
+    results = converter.convert_batch(
+        config, world_paths, args.tilesets, args.tileset_output, args.map_output,
+        workers=args.workers, all_tilesets=all_tilesets)
+
+    failures = [result for result in results if not result["ok"]]
+    for result in failures:
+        print(f"Failed: {result['world']}: {result['error']}")
+
+    missing = converter.aggregate_missing_tiles(results)
+    if missing:
+        print(f"{len(missing)} distinct tiles were missing from the given tilesets "
+              f"(see the generated tilesets{' and ' + args.missing_report if args.missing_report else ''}).")
+    if args.missing_report:
+        report = [
+            {"tile": converter.missing_key_properties(key), "worldCount": len(worlds), "worlds": worlds}
+            for key, worlds in sorted(missing.items(), key=lambda item: -len(item[1]))
+        ]
+        with open(args.missing_report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+
+    print(f"Converted {len(results) - len(failures)}/{len(results)} worlds.")
+    return 1 if failures else 0
+
+def run_ui():
+    load_tkinter()
     root = tk.Tk()
     app = StarboundToTiledUI(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Convert Starbound .world/.shipworld files to Tiled maps. "
+                    "Run without arguments to open the converter window.")
+    parser.add_argument("worlds", nargs="*",
+                        help=".world or .shipworld files, folders to search for them, or layer stores saved with "
+                             "--save-layers (with --to-world: Tiled .json maps)")
+    parser.add_argument("--config", help="path to starbound.config containing the worldToTiled data")
+    parser.add_argument("--tilesets", action="append", default=[], metavar="TILESET",
+                        help="tileset .json file to resolve tiles against; repeat the option for each tileset "
+                             "(it takes one file, so world paths may follow it)")
+    parser.add_argument("--tileset-output", help="folder for the generated tilesets")
+    parser.add_argument("--map-output", help="folder for the converted Tiled maps")
+    parser.add_argument("--workers", type=int, default=1, help="number of worlds converted in parallel (default: 1)")
+    parser.add_argument("--region-workers", type=int, default=1,
+                        help="processes decoding the regions of each world (0 = one per CPU core, default: 1)")
+    parser.add_argument("--stream-bands", type=int, default=0, metavar="ROWS",
+                        help="convert ROWS region rows (32 tiles each) at a time so memory use does not grow "
+                             "with the world size; generated tile IDs and object order may differ from a normal run")
+    parser.add_argument("--region-cache", metavar="DIR",
+                        help="keep decoded regions in DIR so later runs only decode regions that changed")
+    parser.add_argument("--infinite", action="store_true",
+                        help="write Tiled infinite maps with one chunk per 32x32 region, skipping empty regions")
+    parser.add_argument("--missing-report", help="write the tiles missing from the tilesets, across all worlds, to this .json file")
+    parser.add_argument("--profile", action="store_true",
+                        help="write the time spent in each conversion stage to <map>.profile.json next to each map")
+    parser.add_argument("--profile-python", action="store_true",
+                        help="also capture the conversion with cProfile (adds the slowest functions to the report "
+                             "and writes <map>.prof)")
+    parser.add_argument("--trace-allocations", action="store_true",
+                        help="also record the memory allocated by each stage with tracemalloc (slows the conversion down)")
+    parser.add_argument("--json-format", choices=("pretty", "compact"), default="pretty",
+                        help="pretty (indented) or compact (no whitespace, smaller and faster to write) map and "
+                             "generated tileset files (default: pretty)")
+    parser.add_argument("--json-backend", choices=("auto", "json", "orjson"), default="auto",
+                        help="serializer for compact files: orjson when installed (auto), or the json module")
+    parser.add_argument("--compression", choices=LAYER_COMPRESSIONS, default="zlib",
+                        help="tile layer format: base64 compressed with zlib, gzip or zstd (Tiled 1.3+), "
+                             "uncompressed base64 (none) or csv (default: zlib)")
+    parser.add_argument("--compression-level", type=int, metavar="LEVEL",
+                        help="compression level: 0-9 for zlib and gzip (default 6), 1-22 for zstd (default 3); with "
+                             "--to-world, the zlib level of the rewritten world regions (1 is several times faster)")
+    parser.add_argument("--shared-tileset", action="store_true",
+                        help="add missing tiles to one generated tileset shared by all worlds, "
+                             f"<tileset-output>/{SHARED_TILESET_NAME}, whose tile IDs stay the same across runs")
+    parser.add_argument("--mod-layers", action="store_true",
+                        help="write foreground and background matmods (grass, moss, ...) to their own tile layers, "
+                             "resolved from tileset tiles with only a \"mod\" property, instead of needing a tile "
+                             "for every material and mod combination")
+    parser.add_argument("--save-layers", metavar="DIR",
+                        help="also save each world's resolved tile layers (as .npy files) and entities to "
+                             f"DIR/<world>{LAYER_STORE_EXTENSION}; converting that folder instead of the world writes "
+                             "the map again (e.g. with another --roi, --split-structures or --compression) without "
+                             "decoding the world")
+    parser.add_argument("--index-cache", metavar="DIR", default=default_index_cache_dir(),
+                        help="folder for compiled config and tileset indexes, so a large starbound.config and the "
+                             "tilesets are only parsed again after they changed (default: %(default)s)")
+    parser.add_argument("--no-index-cache", action="store_true", help="parse starbound.config and the tilesets on every run")
+    parser.add_argument("--entities", type=parse_entity_kinds, default=list(ENTITY_TYPES), metavar="KIND,...",
+                        help="comma-separated entity kinds written to the maps: " + ", ".join(ENTITY_TYPES) +
+                             " (default: all; with none, only the tile layers are converted and entities are never read)")
+    parser.add_argument("--exclude-entities", type=parse_entity_kinds, default=[], metavar="KIND,...",
+                        help="comma-separated entity kinds left out of the maps")
+    area = parser.add_mutually_exclusive_group()
+    area.add_argument("--roi", type=parse_roi, metavar="X0,Y0,X1,Y1",
+                      help="only convert the world tiles from X0,Y0 (bottom left, as shown in game) up to X1,Y1 "
+                           "(exclusive); the map is cropped to them and only the regions overlapping them are read")
+    area.add_argument("--auto-bbox", action="store_true",
+                      help="crop each map to the bounding box of the tiles with a material or liquid")
+    parser.add_argument("--split-structures", action="store_true",
+                        help="write every group of connected foreground/background tiles as its own cropped map "
+                             "(<world>_structure1.json, largest first), all sharing the world's generated tileset")
+    parser.add_argument("--structure-gap", type=int, default=0, metavar="TILES",
+                        help="with --split-structures, parts up to TILES empty tiles apart belong to the same structure (default: 0)")
+    parser.add_argument("--min-structure-tiles", type=int, default=16, metavar="N",
+                        help="with --split-structures, skip structures of fewer than N tiles (default: 16)")
+    parser.add_argument("--delta-from", metavar="WORLD",
+                        help="only write what changed since WORLD, an earlier copy of the one converted world file, to "
+                             "<world>_delta.json: changed tiles as they are now (their old tiles on hidden \"(before)\" "
+                             "layers), added entities on the usual layers and removed ones on \"removed\" layers; "
+                             "with --auto-bbox the map is cropped to the changed tiles and entities")
+    parser.add_argument("--to-world", action="store_true",
+                        help="convert the given Tiled maps back to worlds in --world-output, resolving their tiles "
+                             "through the --tilesets (and the tilesets next to each map) and the --config tables")
+    parser.add_argument("--world-output", metavar="DIR", help="with --to-world, folder for the written worlds")
+    parser.add_argument("--base-world", metavar="WORLD",
+                        help="with --to-world, world the map's tiles are written into, keeping its metadata, entities "
+                             "and the tiles the map did not change (usually the world the map was converted from); "
+                             "without it a new world of the map's size is written")
+    parser.add_argument("--origin", type=parse_origin, default=(0, 0), metavar="X,Y",
+                        help="with --to-world, world tile of the map's bottom-left tile, e.g. the X0,Y0 of the --roi "
+                             "the map was converted with (default: 0,0)")
+    # World paths may be given before, between and after the options
+    args = parser.parse_intermixed_args(argv)
+
+    if not args.worlds:
+        run_ui()
+        return 0
+
+    if args.to_world:
+        missing = [option for option, value in (("--config", args.config), ("--world-output", args.world_output)) if not value]
+        if missing:
+            parser.error("missing required options: " + ", ".join(missing))
+        return run_to_world_cli(args)
+
+    missing = [option for option, value in (("--config", args.config), ("--tilesets", args.tilesets),
+               ("--tileset-output", args.tileset_output), ("--map-output", args.map_output)) if not value]
+    if missing:
+        parser.error("missing required options: " + ", ".join(missing))
+    if args.split_structures and args.stream_bands > 0:
+        parser.error("--split-structures needs the whole map in memory and cannot be combined with --stream-bands")
+    if args.delta_from:
+        conflicting = [option for option, value in (("--stream-bands", args.stream_bands > 0),
+                       ("--split-structures", args.split_structures), ("--save-layers", args.save_layers)) if value]
+        if conflicting:
+            parser.error("--delta-from cannot be combined with " + ", ".join(conflicting))
+        if len(args.worlds) != 1 or not os.path.isfile(args.worlds[0]):
+            parser.error("--delta-from compares exactly one world file with the earlier copy; got " + " ".join(args.worlds))
+    if args.compression == "zstd" and zstandard is None:
+        parser.error("--compression zstd needs the zstandard package (pip install zstandard)")
+
+    return run_cli(args)
+
+if __name__ == "__main__":
+    sys.exit(main())